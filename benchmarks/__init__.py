@@ -0,0 +1,4 @@
+"""
+Benchmarks that run the game's systems against a throwaway database. See README.md for how to run them.
+
+"""
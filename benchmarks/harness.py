@@ -0,0 +1,132 @@
+"""
+Shared set-up for benchmarks: a throwaway database, a fake clock and call counters.
+
+"""
+from __future__ import print_function
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+
+def argument_parser(description):
+    """
+    Argument parser with the options every benchmark shares.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--seed", type=int, default=None, help="random seed, to make runs repeatable")
+    parser.add_argument("--keep-db", action="store_true", help="don't delete the generated database afterwards")
+    return parser
+
+
+class BenchmarkDatabase(object):
+    """
+    Creates and migrates an empty SQLite database in a temporary directory and starts up Django and Evennia against
+    it. Game modules must only be imported after this has been set up, since Evennia's API is not ready until then.
+    """
+    def __init__(self, keep=False):
+        self.keep = keep
+        self.directory = tempfile.mkdtemp(prefix="larsethia_benchmark_")
+        self.path = os.path.join(self.directory, "benchmark.db3")
+
+    def __enter__(self):
+        os.environ["BENCHMARK_DB"] = self.path
+        os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+
+        import django
+        django.setup()
+        import evennia
+        evennia._init()
+
+        from django.core.management import call_command
+        call_command("migrate", interactive=False, verbosity=0)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.keep:
+            print("Kept benchmark database at {}".format(self.path))
+        else:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class FakeClock(object):
+    """
+    Stands in for time.time so benchmarks can skip ahead instead of waiting.
+    """
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class CallCounter(object):
+    """
+    Counts calls to a method on a class while active. Use as a context manager so the original is always restored.
+    """
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+        self.count = 0
+
+    def __enter__(self):
+        self.had_own = self.name in self.owner.__dict__
+        self.own = self.owner.__dict__.get(self.name)
+        original = getattr(self.owner, self.name)
+
+        def counted(*args, **kwargs):
+            self.count += 1
+            return original(*args, **kwargs)
+
+        setattr(self.owner, self.name, counted)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.had_own:
+            setattr(self.owner, self.name, self.own)
+        else:
+            delattr(self.owner, self.name)
+
+    def reset(self):
+        count = self.count
+        self.count = 0
+        return count
+
+
+class Timer(object):
+    """
+    Wall-clock timer for a block of code.
+    """
+    def __enter__(self):
+        self.start = time.time()
+        self.elapsed = 0
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.time() - self.start
+
+
+def seed(value):
+    if value is not None:
+        random.seed(value)
+
+
+def report(title, rows):
+    """
+    Print results as aligned "name: value" rows.
+
+    Args:
+        title (str): Heading for the results.
+        rows (list): Tuples of (name, value).
+    """
+    print(title)
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        if isinstance(value, float):
+            value = "{:.3f}".format(value)
+        print("  {}: {}".format(name.ljust(width), value))
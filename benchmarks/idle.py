@@ -0,0 +1,159 @@
+"""
+Idle benchmark
+
+Builds a world of rooms with idle objects and online characters in a throwaway database, then drives the real idle
+scheduler through a fake clock and reports what it costs.
+
+Usage:
+    python -m benchmarks.idle --rooms 50 --characters 500 --ticks 1000
+
+Use --help for all options.
+
+"""
+from __future__ import print_function
+import random
+from benchmarks.harness import (argument_parser, report, seed, BenchmarkDatabase, CallCounter, FakeClock, Timer)
+
+
+def run_command(cmd_class, caller, args, lhs, rhs, switches=()):
+    """
+    Run a command's func directly, as if the command handler had already parsed it.
+    """
+    cmd = cmd_class()
+    cmd.caller = caller
+    cmd.args = args
+    cmd.lhs = lhs
+    cmd.rhs = rhs
+    cmd.switches = list(switches)
+    cmd.func()
+
+
+def build_world(args):
+    """
+    Create rooms, idle objects and characters. Idle lines are added with @idle just like a builder would.
+
+    Returns:
+        rooms (list): All rooms created.
+        characters (list): All characters created, spread randomly over the rooms.
+    """
+    from evennia.utils.create import create_object
+    from systems.idle import CmdIdle
+
+    rooms = [create_object("typeclasses.rooms.Room", key="Room {}".format(i)) for i in range(args.rooms)]
+
+    builder = create_object("typeclasses.characters.Character", key="Builder")
+    idle_rooms = rooms[:int(round(len(rooms) * args.idle_rooms))]
+    for room in idle_rooms:
+        # Place the builder directly so no look or move hooks run
+        builder.location = room
+        targets = ["here"]
+        for i in range(args.idle_objects):
+            obj = create_object("typeclasses.objects.Object", key="idle thing {}".format(i), location=room, home=room)
+            targets.append(obj.key)
+        for target in targets:
+            for i in range(args.lines):
+                rhs = "{}, Idle line {} of {}.".format(args.avg_seconds, i, target)
+                run_command(CmdIdle, builder, "{} = {}".format(target, rhs), target, rhs)
+    builder.location = None
+
+    characters = []
+    for i in range(args.characters):
+        room = random.choice(rooms)
+        characters.append(create_object("typeclasses.characters.Character", key="Character {}".format(i),
+                                        location=room, home=room))
+    return rooms, characters
+
+
+def main():
+    parser = argument_parser("Benchmark the idle system.")
+    parser.add_argument("--rooms", type=int, default=20, help="number of rooms")
+    parser.add_argument("--idle-rooms", type=float, default=0.5,
+                        help="fraction of rooms that have idle lines, the rest have none")
+    parser.add_argument("--idle-objects", type=int, default=3, help="objects with idle lines in each idle room")
+    parser.add_argument("--lines", type=int, default=3, help="idle lines on each idle object and idle room")
+    parser.add_argument("--avg-seconds", type=int, default=60, help="average seconds between each idle line")
+    parser.add_argument("--characters", type=int, default=200, help="number of online characters")
+    parser.add_argument("--ticks", type=int, default=1000, help="number of idle intervals to simulate")
+    parser.add_argument("--moves", type=int, default=0, help="characters moving to a random room each tick")
+    args = parser.parse_args()
+    seed(args.seed)
+
+    with BenchmarkDatabase(keep=args.keep_db):
+        run(args)
+
+
+def run(args):
+    from evennia.locks.lockhandler import LockHandler
+    from evennia.typeclasses.attributes import AttributeHandler
+    from systems.idle import IDLE_SCHEDULER
+    from typeclasses.characters import Character
+    from utils.constants import IDLE_INTERVAL
+
+    clock = FakeClock()
+    IDLE_SCHEDULER.clock = clock
+
+    with Timer() as setup_timer:
+        rooms, characters = build_world(args)
+    report("World", [
+        ("rooms", len(rooms)),
+        ("rooms with idle lines", int(round(len(rooms) * args.idle_rooms))),
+        ("characters", len(characters)),
+        ("setup seconds", setup_timer.elapsed),
+    ])
+
+    with CallCounter(LockHandler, "check") as locks, CallCounter(AttributeHandler, "get") as attributes, \
+            CallCounter(Character, "msg") as messages:
+        with Timer() as login_timer:
+            for character in characters:
+                IDLE_SCHEDULER.add_viewer(character)
+        report("Login", [
+            ("seconds", login_timer.elapsed),
+            ("lock checks", locks.reset()),
+            ("attribute reads", attributes.reset()),
+        ])
+
+        tick_seconds = 0
+        tick_locks = tick_attributes = tick_messages = 0
+        move_seconds = 0
+        move_locks = move_attributes = 0
+        for _ in range(args.ticks):
+            clock.advance(IDLE_INTERVAL)
+            with Timer() as tick_timer:
+                IDLE_SCHEDULER.process_due()
+            tick_seconds += tick_timer.elapsed
+            tick_locks += locks.reset()
+            tick_attributes += attributes.reset()
+            tick_messages += messages.reset()
+
+            if args.moves:
+                with Timer() as move_timer:
+                    for character in random.sample(characters, min(args.moves, len(characters))):
+                        character.move_to(random.choice(rooms), quiet=True)
+                move_seconds += move_timer.elapsed
+                move_locks += locks.reset()
+                move_attributes += attributes.reset()
+                messages.reset()
+
+    ticks = max(args.ticks, 1)
+    report("Ticks", [
+        ("ticks", args.ticks),
+        ("simulated seconds", args.ticks * IDLE_INTERVAL),
+        ("seconds", tick_seconds),
+        ("ticks/sec", args.ticks / tick_seconds if tick_seconds else float("inf")),
+        ("lock checks/tick", float(tick_locks) / ticks),
+        ("attribute reads/tick", float(tick_attributes) / ticks),
+        ("messages delivered", tick_messages),
+        ("messages/tick", float(tick_messages) / ticks),
+    ])
+    if args.moves:
+        moves = max(args.ticks * min(args.moves, len(characters)), 1)
+        report("Moves (including the look after each move)", [
+            ("moves", moves),
+            ("seconds", move_seconds),
+            ("lock checks/move", float(move_locks) / moves),
+            ("attribute reads/move", float(move_attributes) / moves),
+        ])
+
+
+if __name__ == "__main__":
+    main()
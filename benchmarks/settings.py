@@ -0,0 +1,18 @@
+"""
+Settings used by the benchmarks. Uses the game's settings if they exist, but always points the database at a
+throwaway SQLite file.
+
+"""
+import os
+
+try:
+    from server.conf.settings import *
+except ImportError:
+    from evennia.settings_default import *
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("BENCHMARK_DB", os.path.join(os.path.dirname(__file__), "benchmark.db3")),
+    }
+}
@@ -0,0 +1,107 @@
+"""
+Spawner benchmark
+
+Measures how long a spawner takes to spawn its target as the number of Attributes set on spawned objects grows,
+compared against setting each Attribute and the locks one write at a time, and how much parsing and memory sharing
+lock definitions between spawned objects saves.
+
+Usage:
+    python -m benchmarks.spawner --attributes 0 5 10 25 50 --spawns 50
+
+Use --help for all options.
+
+"""
+from __future__ import print_function
+from benchmarks.harness import argument_parser, report, seed, BenchmarkDatabase, Timer
+
+
+def spawn_one_by_one(spawner):
+    """
+    Spawn the way spawners used to, with a separate write for every Attribute and a second pass over the locks.
+    """
+    from evennia.utils.create import create_object
+
+    spawned = create_object(typeclass=spawner.db.spawn_type,
+                            key=spawner.db.spawn_name,
+                            location=spawner.obj,
+                            home=spawner.obj,
+                            aliases=spawner.db.aliases,
+                            locks=spawner.db.lockstring)
+    for attr, value in spawner.db.attributes.items():
+        setattr(spawned.db, attr, value)
+    spawned.locks.add(str(spawner.lock_holder.locks))
+    spawned.db.spawner = spawner
+    return spawned
+
+
+def create_spawner(room, num_attributes):
+    from evennia.utils.create import create_script
+    from systems.spawner import Spawner
+
+    spawner = create_script(typeclass=Spawner, key=Spawner.get_key("thing"), obj=room, persistent=True,
+                            autostart=False)
+    spawner.db.spawn_name = "thing"
+    spawner.db.aliases = ["widget"]
+    spawner.db.spawn_type = "typeclasses.objects.Object"
+    spawner.db.attributes = dict(("attribute_{}".format(i), "value {}".format(i)) for i in range(num_attributes))
+    spawner.start()
+    return spawner
+
+
+def time_spawns(spawn, spawner, num_spawns):
+    """
+    Returns:
+        seconds (float): Average seconds per spawn.
+    """
+    spawned = []
+    with Timer() as timer:
+        for _ in range(num_spawns):
+            spawned.append(spawn(spawner))
+    for obj in spawned:
+        obj.delete()
+    return timer.elapsed / max(num_spawns, 1)
+
+
+def main():
+    parser = argument_parser("Benchmark spawning objects.")
+    parser.add_argument("--attributes", type=int, nargs="+", default=[0, 1, 5, 10, 25, 50],
+                        help="numbers of Attributes on spawned objects to measure")
+    parser.add_argument("--spawns", type=int, default=50, help="spawns to average over for each measurement")
+    args = parser.parse_args()
+    seed(args.seed)
+
+    with BenchmarkDatabase(keep=args.keep_db):
+        run(args)
+
+
+def run(args):
+    from evennia.utils.create import create_object
+
+    room = create_object("typeclasses.rooms.Room", key="Spawn Room")
+    rows = []
+    for num_attributes in args.attributes:
+        spawner = create_spawner(room, num_attributes)
+        batched = time_spawns(lambda spawner: spawner.spawn_target(), spawner, args.spawns)
+        one_by_one = time_spawns(spawn_one_by_one, spawner, args.spawns)
+        spawner.stop()
+        rows.append(("{} attributes".format(num_attributes),
+                     "{:.2f} ms batched, {:.2f} ms one by one".format(batched * 1000, one_by_one * 1000)))
+    from systems.spawner import bulk_insert_returns_ids
+    if bulk_insert_returns_ids():
+        rows.append(("Attribute inserts", "one bulk insert per spawn"))
+    else:
+        rows.append(("Attribute inserts", "one per Attribute, since this database can't return ids from bulk inserts"))
+    report("Spawn latency", rows)
+
+    from utils.lock_cache import LOCK_CACHE
+    stats = LOCK_CACHE.stats()
+    report("Lock sharing", [
+        ("Distinct lockstrings", stats["lockstrings"]),
+        ("Parses avoided", "{} of {}".format(stats["hits"], stats["hits"] + stats["misses"])),
+        ("Memory saved", "{:.1f} KB".format(stats["bytes_saved"] / 1024.0)),
+        ("Parse time saved", "{:.2f} ms".format(stats["seconds_saved"] * 1000)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,9 @@ at_server_cold_start()
 at_server_cold_stop()
 
 """
+from systems.idle import IDLE_SCHEDULER
+from systems.quests import QUEST_REGISTRY, migrate_quest_attributes
+from systems.spawner import SPAWNER_ENGINE, SPAWNER_REGISTRY
 
 
 def at_server_start():
@@ -22,7 +25,11 @@ def at_server_start():
     This is called every time the server starts up, regardless of
     how it was shut down.
     """
-    pass
+    IDLE_SCHEDULER.start()
+    QUEST_REGISTRY.load()
+    migrate_quest_attributes()
+    SPAWNER_REGISTRY.load()
+    SPAWNER_ENGINE.start()
 
 
 def at_server_stop():
@@ -30,7 +37,8 @@ def at_server_stop():
     This is called just before the server is shut down, regardless
     of it is for a reload, reset or shutdown.
     """
-    pass
+    IDLE_SCHEDULER.stop()
+    SPAWNER_ENGINE.stop()
 
 
 def at_server_reload_start():
@@ -21,6 +21,7 @@ lock functions from evennia.locks.lockfuncs.
 """
 from evennia.locks.lockfuncs import CF_MAPPING
 from evennia.utils import logger
+from systems.quests import QUEST_LOCKS, QUEST_REGISTRY
 
 
 def quest(accessing_obj, accessed_obj, *args, **kwargs):
@@ -32,8 +33,22 @@ def quest(accessing_obj, accessed_obj, *args, **kwargs):
         logger.log_warn("Invalid quest lock on {} accessed by {}.".format(accessed_obj, accessing_obj))
         return False
 
-    # Just check if we have seen the quest before
+    # The same lock tends to be checked many times in a row, so reuse the result until quest progress changes
+    key = (args, kwargs.get('compare', 'eq'))
+    result = QUEST_LOCKS.get(accessing_obj, key)
+    if result is None:
+        result = _quest(accessing_obj, accessed_obj, *args, **kwargs)
+        QUEST_LOCKS.set(accessing_obj, key, result)
+    return result
+
+
+def _quest(accessing_obj, accessed_obj, *args, **kwargs):
     quest_name = args[0]
+    if not QUEST_REGISTRY.get(quest_name):
+        logger.log_warn("Quest lock on {} accessed by {} uses unknown quest {}.".format(
+            accessed_obj, accessing_obj, quest_name))
+
+    # Just check if we have seen the quest before
     if len(args) == 1:
         return accessing_obj.quest_status(quest_name) is not None
 
@@ -1,5 +1,90 @@
+import ast
 from commands.command import Command
+from evennia.utils import logger
 from evennia.utils.evmenu import EvMenu
+from evennia.utils.utils import callables_from_module
+import importlib
+import inspect
+import sys
+from systems.dialogue_data import DialogueData
+from utils.room_index import RoomAttributeIndex
+
+
+class DialogueGraph(object):
+    """
+    The nodes of a talk file, found once and shared by every conversation that uses it.
+    """
+    def __init__(self, module):
+        """
+        Raises:
+            ValueError: If the talk file has no start node or has options going to nodes that don't exist.
+        """
+        self.module = module
+        self.path = module.__name__
+        # Same nodes EvMenu would find if given the module path
+        self.nodes = callables_from_module(module)
+
+        if "start" not in self.nodes:
+            raise ValueError("Talk file {} has no start node.".format(self.path))
+        dangling = sorted(goto for goto in self.gotos() if goto not in self.nodes)
+        if dangling:
+            raise ValueError("Talk file {} has options going to missing nodes: {}".format(
+                self.path, ", ".join(dangling)))
+
+    def gotos(self):
+        """
+        Returns:
+            gotos (set): Every node name written as the "goto" of an option in the talk file's source.
+        """
+        try:
+            source = inspect.getsource(self.module)
+        except (IOError, TypeError):
+            # No source to check, such as when only compiled files were deployed
+            return set()
+
+        gotos = set()
+        for node in ast.walk(ast.parse(source)):
+            if isinstance(node, ast.Dict):
+                for key, value in zip(node.keys, node.values):
+                    if isinstance(key, ast.Str) and key.s == "goto" and isinstance(value, ast.Str):
+                        gotos.add(value.s)
+        return gotos
+
+    def is_current(self):
+        """
+        Returns:
+            current (bool): False if the talk file's module has been reloaded since we compiled it.
+        """
+        return sys.modules.get(self.path) is self.module and vars(self.module).get("start") is self.nodes["start"]
+
+
+# talk file path -> DialogueGraph or DialogueData
+DIALOGUE_GRAPHS = {}
+# Objects with talk files in each room
+TALKERS = RoomAttributeIndex("talk_file")
+
+
+def dialogue_graph(talk_file):
+    """
+    Args:
+        talk_file (str): Python path to a talk file, or path to a JSON talk file relative to the game directory.
+
+    Returns:
+        graph (DialogueGraph or DialogueData): The talk file's compiled nodes.
+
+    Raises:
+        ImportError: If the talk file doesn't exist.
+        ValueError: If the talk file is invalid.
+    """
+    graph = DIALOGUE_GRAPHS.get(talk_file)
+    if graph is None or not graph.is_current():
+        DIALOGUE_GRAPHS.pop(talk_file, None)
+        if talk_file.endswith(".json"):
+            graph = DialogueData(talk_file)
+        else:
+            graph = DialogueGraph(importlib.import_module(talk_file))
+        DIALOGUE_GRAPHS[talk_file] = graph
+    return graph
 
 
 def talk(player, target):
@@ -9,11 +94,16 @@ def talk(player, target):
     """
     # Now that we have a legal target, try to talk
     try:
-        # Don't automatically look on exit
-        EvMenu(player, target.db.talk_file, target=target)
-        player.location.msg_contents("{} talks to {}.".format(player.name, target.name), exclude=player)
-    except ImportError:
+        graph = dialogue_graph(target.db.talk_file)
+    except Exception as err:
+        # Anything can go wrong while importing a talk module, so don't let it take down the command
+        logger.log_trace("Broken talk file on {}({}): {}".format(target.key, target.dbref, err))
         player.msg("Dialogue is broken, please contact the builders.")
+        return
+
+    # Don't automatically look on exit
+    EvMenu(player, graph.nodes, target=target)
+    player.location.msg_contents("{} talks to {}.".format(player.name, target.name), exclude=player)
 
 
 class CmdTalk(Command):
@@ -38,13 +128,10 @@ class CmdTalk(Command):
     def func(self):
         # Acquire target
         if not self.args:
-            possible = []
-            legal = []
-            for obj in self.caller.location.contents:
-                if self.can_talk(obj):
-                    possible.append(obj)
-                    if obj.access(self.caller, "talk", default=True):
-                        legal.append(obj)
+            location = self.caller.location
+            # Everything in the set already has a talk file
+            candidates = sorted((obj for obj in TALKERS.get(location) if obj != self.caller), key=lambda obj: obj.id)
+            possible, legal = location.visible_contents(self.caller, candidates, "talk")
 
             if len(legal) == 0:
                 if len(possible) == 1:
@@ -91,8 +178,9 @@ class CmdAddTalk(Command):
 
     Usage:
      @addtalk <npc> = <menu file location>
-    Example:
+    Examples:
      @addtalk Merchant = world.npcs.briskell_merchant
+     @addtalk Merchant = world/npcs/briskell_merchant.json
     """
     key = "@addtalk"
     locks = "cmd:perm(addtalk) or perm(Builders)"
@@ -109,6 +197,13 @@ class CmdAddTalk(Command):
 
         # Try to talk
         if target:
+            try:
+                dialogue_graph(self.rhs)
+            except Exception as err:
+                logger.log_trace("Broken talk file {}: {}".format(self.rhs, err))
+                self.caller.msg("Not setting talk file, {} is broken: {}".format(self.rhs, err))
+                return
+
             target.db.talk_file = self.rhs
             self.caller.msg("{}'s talk file set to: {}".format(target.key, self.rhs))
 
@@ -0,0 +1,188 @@
+"""
+Dialogue data files
+
+Talk files can be JSON instead of Python. A data file looks like:
+
+    {
+        "quest": "lost_kitten",
+        "options": {
+            "OPTION_BYE": {"desc": "\"Goodbye.\"", "goto": "end"}
+        },
+        "nodes": {
+            "start": {
+                "variants": [
+                    {"stage": [null], "text": "\"Did you lose something?\"",
+                     "options": [{"desc": "\"I'll look for it.\"", "goto": "search"}, "OPTION_BYE"]},
+                    {"text": "\"Any luck?\"", "options": ["OPTION_BYE"]}
+                ]
+            },
+            "search": {"text": "\"Thank you!\"", "actions": [{"do": "quest_advance", "stage": 1}]},
+            "end": {"text": "\"Nice to meet you, {caller.name}.\"", "format": true}
+        }
+    }
+
+"quest" is the quest that stages and actions refer to unless they name their own. Each node either has "text",
+"options" and "actions" directly, or a list of "variants" with those keys. A variant with "stage" is used when the
+character's stage of the quest is in that list (null meaning they haven't started it, 0 meaning they've completed it),
+and the last variant without a "stage" is used otherwise. Options are either written out or named from the shared
+"options". Nodes with "format" have "{caller.name}" and the like filled in from the character talking. See
+world/npcs/sample.json for a complete example.
+
+Everything is worked out when the file loads, so showing a node is just a lookup: every variant's text and options
+are built once, and each node maps every quest stage it mentions straight to the variant it uses.
+
+"""
+from collections import namedtuple
+from django.conf import settings
+from evennia.utils.utils import class_from_module
+import json
+import os
+
+
+# What a node shows for one quest stage
+Rendering = namedtuple("Rendering", ("text", "options", "actions"))
+
+
+def quest_advance(caller, quest, stage):
+    caller.quest_advance(quest, stage)
+
+
+def quest_complete(caller, quest):
+    caller.quest_complete(quest)
+
+
+def take(caller, typeclass):
+    """
+    Take everything of a type the character is carrying, such as a quest item being handed over.
+    """
+    for obj in caller.contents:
+        if isinstance(obj, typeclass):
+            obj.delete()
+
+
+def make_node(quest, by_stage, default, formatted):
+    """
+    Build one node of a data dialogue. EvMenu inspects the arguments of every node, so nodes have to be plain functions
+    like the ones in a Python talk file.
+
+    Args:
+        quest (str): Quest whose stage picks the rendering.
+        by_stage (dict): Rendering by quest stage.
+        default (Rendering): Rendering for stages not in by_stage.
+        formatted (bool): Whether to fill in the text from the character talking.
+
+    Returns:
+        node (function): Node function taking the character talking.
+    """
+    def node(caller, raw_string=None):
+        if by_stage:
+            rendering = by_stage.get(caller.quest_status(quest), default)
+        else:
+            rendering = default
+
+        for action, args in rendering.actions:
+            action(caller, *args)
+
+        if formatted:
+            return rendering.text.format(caller=caller), rendering.options
+        return rendering.text, rendering.options
+    return node
+
+
+class DialogueData(object):
+    """
+    A data dialogue loaded from a JSON talk file.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path to the JSON file, relative to the game directory.
+
+        Raises:
+            ImportError: If the file doesn't exist.
+            ValueError: If the file isn't a valid dialogue.
+        """
+        self.path = path
+        self.filename = os.path.join(settings.GAME_DIR, path)
+        try:
+            self.mtime = os.path.getmtime(self.filename)
+            with open(self.filename) as data_file:
+                data = json.load(data_file)
+        except (IOError, OSError):
+            raise ImportError("No talk file at {}.".format(self.filename))
+
+        self.quest = data.get("quest")
+        shared_options = data.get("options", {})
+        self.gotos = set()
+        self.nodes = {}
+        for name, node in data.get("nodes", {}).items():
+            try:
+                self.nodes[name] = self.compile_node(name, node, shared_options)
+            except KeyError as err:
+                raise ValueError("Node {} is missing {}.".format(name, err))
+
+        if "start" not in self.nodes:
+            raise ValueError("Talk file {} has no start node.".format(path))
+        dangling = sorted(goto for goto in self.gotos if goto not in self.nodes)
+        if dangling:
+            raise ValueError("Talk file {} has options going to missing nodes: {}".format(path, ", ".join(dangling)))
+
+    def compile_node(self, name, node, shared_options):
+        variants = node.get("variants", [node])
+        by_stage = {}
+        default = None
+        for variant in variants:
+            rendering = self.compile_variant(name, variant, shared_options)
+            if "stage" not in variant:
+                default = rendering
+                continue
+            for stage in variant["stage"]:
+                # The first variant mentioning a stage wins
+                by_stage.setdefault(stage, rendering)
+
+        if default is None:
+            # Nothing to show at stages no variant mentions
+            default = Rendering("", (), ())
+        if by_stage and not self.quest:
+            raise ValueError("Node {} has stage variants, but the talk file has no quest.".format(name))
+        return make_node(self.quest, by_stage, default, bool(node.get("format")))
+
+    def compile_variant(self, name, variant, shared_options):
+        options = []
+        for option in variant.get("options", []):
+            if not isinstance(option, dict):
+                if option not in shared_options:
+                    raise ValueError("Node {} uses option {}, which isn't in the talk file's options.".format(
+                        name, option))
+                option = shared_options[option]
+            if "goto" in option:
+                self.gotos.add(option["goto"])
+            options.append(option)
+
+        actions = tuple(self.compile_action(name, action) for action in variant.get("actions", []))
+        return Rendering(variant.get("text", ""), tuple(options), actions)
+
+    def compile_action(self, name, action):
+        kind = action.get("do")
+        quest = action.get("quest", self.quest)
+        if kind == "quest_advance":
+            return quest_advance, (quest, action["stage"])
+        elif kind == "quest_complete":
+            return quest_complete, (quest,)
+        elif kind == "take":
+            try:
+                return take, (class_from_module(action["typeclass"]),)
+            except ImportError:
+                raise ValueError("Node {} takes {}, which isn't a valid class path.".format(
+                    name, action["typeclass"]))
+        raise ValueError("Node {} has an unknown action {}.".format(name, kind))
+
+    def is_current(self):
+        """
+        Returns:
+            current (bool): False if the file has changed since we loaded it.
+        """
+        try:
+            return os.path.getmtime(self.filename) == self.mtime
+        except OSError:
+            return False
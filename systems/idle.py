@@ -1,17 +1,65 @@
+import bisect
+import heapq
+import itertools
+import math
 import random
+import time
 from commands.command import Command
+from evennia.server.sessionhandler import SESSIONS
 from evennia.utils import evtable, logger, search
+from twisted.internet import reactor
 from typeclasses.scripts import Script
 from utils.constants import IDLE_INTERVAL, TAG_CATEGORY_BUILDING
+from utils.room_index import RoomAttributeIndex
 
 
 IDLE_TAG = "idle"
+# Objects with idle lines in each room, including the room itself
+IDLE_SOURCES = RoomAttributeIndex("idle", include_room=True)
+
+
+class IdleSampler(object):
+    """
+    An object's idle lines compiled into cumulative rates, so a line can be picked with a single random draw.
+    """
+    def __init__(self, idle_list):
+        self.lines = []
+        self.cumulative_rates = []
+        self.total_rate = 0
+        for idle_time, idle_line in idle_list or ():
+            # If it's not a valid number, just always display it
+            if idle_time <= 0:
+                idle_time = IDLE_INTERVAL
+            self.total_rate += 1.0 / idle_time
+            self.lines.append(idle_line)
+            self.cumulative_rates.append(self.total_rate)
+
+    def pick(self, roll):
+        """
+        Args:
+            roll (float): Number from 0 up to total_rate.
+
+        Returns:
+            idle_line (str): The line the roll landed on.
+        """
+        return self.lines[min(bisect.bisect_right(self.cumulative_rates, roll), len(self.lines) - 1)]
+
+
+def idle_sampler(obj):
+    """
+    Get the compiled idle lines for an object, which are rebuilt only after @idle changes them.
+    """
+    sampler = obj.ndb.idle_sampler
+    if sampler is None:
+        sampler = IdleSampler(obj.db.idle)
+        obj.ndb.idle_sampler = sampler
+    return sampler
 
 
 class CmdIdle(Command):
     """
-    Checks, adds, or deletes idle text onto an object. Every time the idle
-    script on the player ticks, there's a chance it will display a message.
+    Checks, adds, or deletes idle text onto an object. Players in the same
+    location will see each line roughly once every <avg seconds>.
 
     Usage:
       @idle
@@ -65,21 +113,20 @@ class CmdIdle(Command):
                 self.caller.msg("No location to search for idle objects.")
                 return
 
-            idle_objs = []
-            # The location may also have idle lines
-            if self.caller.location.db.idle:
-                idle_objs.append(self.caller.location)
-            for obj in self.caller.location.contents:
-                if obj.db.idle:
-                    idle_objs.append(obj)
+            idle_objs = sorted(IDLE_SOURCES.get(self.caller.location), key=lambda obj: obj.id)
 
             if len(idle_objs) == 0:
                 self.caller.msg("No objects with idle lines are present in {}.".format(self.caller.location.name))
                 return
 
+            # Builders see every idle object, but it helps to know which ones they'd get lines from
+            _, noticed = self.caller.location.visible_contents(self.caller, idle_objs, "idle")
+            noticed = set(noticed)
             output = "Objects with idle lines in this room:"
             for obj in idle_objs:
                 output += "\n(#{}) {}".format(obj.id, obj.name)
+                if obj not in noticed:
+                    output += " (hidden from you)"
             self.caller.msg(output)
             return
 
@@ -90,6 +137,7 @@ class CmdIdle(Command):
         # Clear all idle messages from an object
         if "clear" in self.switches:
             if target.db.idle:
+                # Removing the Attribute updates the room's idle objects
                 del target.db.idle
                 self.caller.msg("All idle lines cleared from {}.".format(target.name))
             else:
@@ -118,6 +166,8 @@ class CmdIdle(Command):
 
             # Remove the nth element
             _, idle_line = target.db.idle.pop(idle_id)
+            # Changing the list in place doesn't go through the AttributeHandler
+            IDLE_SCHEDULER.lines_changed(target)
             self.caller.msg("Removed from {}: {}".format(target.name, idle_line))
             return
 
@@ -158,53 +208,230 @@ class CmdIdle(Command):
             target.db.idle.append((idle_time, idle_line))
 
         target.tags.add(IDLE_TAG, TAG_CATEGORY_BUILDING)
+        IDLE_SCHEDULER.lines_changed(target)
 
         self.caller.msg("Added new idle message to {}.".format(target.name))
 
 
+class IdleScheduler(object):
+    """
+    Shows idle lines to every online character. Instead of rolling dice every few seconds, each viewer gets a next fire
+    time drawn from an exponential distribution using the combined rate of the idle lines around them, and the
+    scheduler sleeps on a priority queue until the earliest one is due. Work is only done when a message is shown or
+    when a viewer's surroundings change.
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        # viewer -> location we last saw them in
+        self.viewers = {}
+        self.viewers_by_room = {}
+        # viewer -> queue entry of [fire_at, sequence, viewer], where viewer is set to None to cancel it
+        self.entries = {}
+        self.queue = []
+        self.sequence = itertools.count()
+        self.timer = None
+        self.running = False
+
+    def start(self):
+        """
+        Start showing idle messages. Called at server start.
+        """
+        self.running = True
+        # A reload wipes our in-memory state without calling any puppet hooks, and sessions only get their puppets
+        # back once the portal resyncs, so wait a moment before picking up everyone who is online
+        reactor.callLater(IDLE_INTERVAL, self.sync_viewers)
+        self.arm()
+
+    def stop(self):
+        self.running = False
+        if self.timer and self.timer.active():
+            self.timer.cancel()
+        self.timer = None
+
+    def sync_viewers(self):
+        for session in SESSIONS.get_sessions():
+            if session.puppet and session.puppet not in self.viewers:
+                self.add_viewer(session.puppet)
+
+    def add_viewer(self, viewer):
+        self.remove_viewer(viewer)
+        self.viewers[viewer] = viewer.location
+        if viewer.location:
+            self.viewers_by_room.setdefault(viewer.location, set()).add(viewer)
+        self.schedule(viewer)
+
+    def remove_viewer(self, viewer):
+        if viewer not in self.viewers:
+            return
+        location = self.viewers.pop(viewer)
+        room_viewers = self.viewers_by_room.get(location)
+        if room_viewers is not None:
+            room_viewers.discard(viewer)
+            if not room_viewers:
+                del self.viewers_by_room[location]
+        self.cancel(viewer)
+
+    def object_arrived(self, room, obj):
+        """
+        Called when anything enters a room. Viewers get a fresh schedule for their new surroundings, and anything
+        bringing idle lines along changes the odds for everyone already there.
+        """
+        if obj in self.viewers:
+            self.add_viewer(obj)
+        if IDLE_SOURCES.arrived(room, obj):
+            self.reschedule_room(room)
+
+    def object_left(self, room, obj):
+        """
+        Called when anything leaves a room. Viewers are picked up again when they arrive.
+        """
+        if IDLE_SOURCES.left(room, obj):
+            self.reschedule_room(room)
+
+    def object_deleted(self, obj):
+        """
+        Called just before an object is deleted, which doesn't go through the room's leave hook.
+        """
+        self.remove_viewer(obj)
+        if obj.location:
+            self.object_left(obj.location, obj)
+
+    def lines_changed(self, obj):
+        """
+        Called when idle lines are added to or removed from an object.
+        """
+        obj.ndb.idle_sampler = None
+        self.reschedule_room(IDLE_SOURCES.changed(obj))
+
+    def reschedule_room(self, room):
+        for viewer in self.viewers_by_room.get(room, ()):
+            self.schedule(viewer)
+
+    @staticmethod
+    def visible_samplers(viewer):
+        """
+        Gather the idle lines of every object the viewer could currently see.
+
+        Args:
+            viewer (Object): Character that would see the idle lines.
+
+        Returns:
+            total_rate (float): Combined expected messages per second of all visible lines.
+            samplers (list): IdleSampler for each visible object with idle lines.
+        """
+        location = viewer.location
+        if not location:
+            return 0, []
+
+        total_rate = 0
+        samplers = []
+        sources = [obj for obj in IDLE_SOURCES.get(location) if obj != viewer]
+        _, noticed = location.visible_contents(viewer, sources, "idle")
+        for obj in noticed:
+            sampler = idle_sampler(obj)
+            total_rate += sampler.total_rate
+            samplers.append(sampler)
+        return total_rate, samplers
+
+    def schedule(self, viewer, total_rate=None):
+        """
+        Pick when the viewer should next see an idle message.
+        """
+        self.cancel(viewer)
+        if total_rate is None:
+            total_rate, _ = self.visible_samplers(viewer)
+        if total_rate <= 0:
+            # Nothing to see; we'll be told when that changes
+            return
+
+        # Only one idle message is shown per interval to avoid spam, so round up to whole intervals. Following expected
+        # value, the chance of a message in any one interval stays the sum of IDLE_INTERVAL / avg seconds of each line
+        chance = total_rate * IDLE_INTERVAL
+        if chance >= 1:
+            intervals = 1
+        else:
+            interval_rate = -math.log(1 - chance) / IDLE_INTERVAL
+            intervals = max(1, math.ceil(random.expovariate(interval_rate) / IDLE_INTERVAL))
+        self.push(viewer, self.clock() + intervals * IDLE_INTERVAL)
+
+    def push(self, viewer, due):
+        entry = [due, next(self.sequence), viewer]
+        self.entries[viewer] = entry
+        heapq.heappush(self.queue, entry)
+        self.arm()
+
+    def cancel(self, viewer):
+        entry = self.entries.pop(viewer, None)
+        if entry:
+            entry[2] = None
+
+    def arm(self):
+        """
+        Sleep until the earliest queued message is due.
+        """
+        while self.queue and self.queue[0][2] is None:
+            heapq.heappop(self.queue)
+        if not self.running or not self.queue:
+            return
+
+        delay = max(0, self.queue[0][0] - self.clock())
+        if self.timer and self.timer.active():
+            self.timer.reset(delay)
+        else:
+            self.timer = reactor.callLater(delay, self.fire)
+
+    def fire(self):
+        self.process_due()
+        self.arm()
+
+    def process_due(self):
+        """
+        Show idle messages to every viewer whose time has come.
+        """
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, viewer = heapq.heappop(self.queue)
+            if viewer is None:
+                continue
+            del self.entries[viewer]
+            try:
+                self.show_idle(viewer)
+            except Exception as e:
+                logger.log_trace("Failed to show idle line to {}: {}".format(viewer.id, e))
+                # Try again next interval rather than leaving the viewer without idle lines until they log in again
+                if viewer in self.viewers and viewer not in self.entries:
+                    self.push(viewer, now + IDLE_INTERVAL)
+
+    def show_idle(self, viewer):
+        # Locks may have changed since we were scheduled, so check again
+        total_rate, samplers = self.visible_samplers(viewer)
+        if total_rate > 0:
+            # Pick a line weighted by how often it should appear
+            roll = random.random() * total_rate
+            for sampler in samplers:
+                if roll < sampler.total_rate:
+                    break
+                roll -= sampler.total_rate
+            idle_line = sampler.pick(roll)
+            # Note that we only message the player, so idle messages are NOT broadcasted to everyone
+            # This means players with a higher perception skill for instance can artificially boost
+            # their chance of seeing idle messages
+            viewer.msg(idle_line)
+        self.schedule(viewer, total_rate)
+
+
+IDLE_SCHEDULER = IdleScheduler()
+
+
 class IdleScript(Script):
     """
-    Check for things with idle messages in the room and display them at random intervals.
+    Deprecated, idle messages are now shown by IDLE_SCHEDULER. Kept so per-character scripts that are still in the
+    database can be loaded and cleaned up.
     """
 
     @staticmethod
     def get_key(obj):
         return "idle_{}".format(obj.id)
 
-    def at_script_creation(self):
-        self.key = self.get_key(self.obj)
-        self.desc = "Polls for idle messages in attached owner's location."
-        # Don't message right off the bat
-        self.start_delay = True
-        self.interval = IDLE_INTERVAL
-        self.persistent = True
-
-    def at_repeat(self):
-        """
-        This gets called every self.obj.db.idle_interval seconds.
-        """
-        if self.obj.location:
-            # Random percentage chance of an idle message proccing
-            remaining_chance = random.random()
-            # Iterate over the room and its contents in random order
-            possible_idle_objs = self.obj.location.contents[:]
-            possible_idle_objs.append(self.obj.location)
-            for obj in random.sample(possible_idle_objs, len(possible_idle_objs)):
-                if (obj != self.obj and obj.db.idle and obj.access(self.obj, "view")
-                        and obj.access(self.obj, "idle", default=True)):
-                    # Randomly pick a line
-                    for idle_time, idle_line in random.sample(obj.db.idle, len(obj.db.idle)):
-                        # If it's not a valid number, just always display it
-                        if idle_time <= 0:
-                            idle_time = IDLE_INTERVAL
-                        # Following expected value, convert this to a probability per 5 seconds
-                        remaining_chance -= IDLE_INTERVAL / idle_time
-                        # Only one object at a time can display its idle message to avoid spam
-                        if remaining_chance <= 0:
-                            # Note that we only message the player, so idle messages are NOT broadcasted to everyone
-                            # This means players with a higher perception skill for instance can artificially boost
-                            # their chance of seeing idle messages
-                            self.obj.msg(idle_line)
-                            return
-        else:
-            logger.log_warn("IdleScript on object {} still running without a location".format(self.obj.id))
+    def is_valid(self):
+        return False
@@ -0,0 +1,152 @@
+"""
+Prototypes
+
+Spawners can spawn from the prototypes in settings.PROTOTYPE_MODULES (world/prototypes.py), which use the same format
+as Evennia's @spawn. Every prototype is flattened through its "prototype" parents and checked once, the first time one
+is needed, into a SpawnTemplate that spawners apply as-is on every spawn.
+
+"""
+from django.conf import settings
+from evennia.utils import logger
+from evennia.utils.utils import all_from_module, class_from_module, make_iter
+
+
+# Prototype keys that aren't Attributes on the spawned object
+RESERVED_KEYS = ("prototype", "key", "typeclass", "location", "home", "destination", "permissions", "locks",
+                 "aliases", "tags")
+NATTRIBUTE_PREFIX = "ndb_"
+
+
+class SpawnTemplate(object):
+    """
+    Everything needed to spawn a prototype, with inheritance already resolved.
+    """
+    def __init__(self, name, prototype):
+        """
+        Args:
+            name (str): Name of the prototype in its module.
+            prototype (dict): Flattened prototype, without a "prototype" key.
+
+        Raises:
+            ImportError: If the prototype's typeclass doesn't exist.
+        """
+        self.name = name
+        self.typeclass = prototype.get("typeclass", settings.BASE_OBJECT_TYPECLASS)
+        class_from_module(self.typeclass)
+        self.aliases = [alias.lower() for alias in make_iter(prototype.get("aliases", []))]
+        self.locks = prototype.get("locks", "")
+        self.permissions = list(make_iter(prototype.get("permissions", [])))
+        # Each tag is either a tag key or a (key, category) pair
+        self.tags = [tuple(make_iter(tag)) for tag in make_iter(prototype.get("tags", []))]
+
+        self.attributes = {}
+        # Callables are called on every spawn, to give each spawned object its own value
+        self.dynamic_attributes = {}
+        self.nattributes = {}
+        for key, value in prototype.items():
+            if key in RESERVED_KEYS:
+                continue
+            if key.startswith(NATTRIBUTE_PREFIX):
+                self.nattributes[key[len(NATTRIBUTE_PREFIX):]] = value
+            elif callable(value):
+                self.dynamic_attributes[key] = value
+            else:
+                self.attributes[key] = value
+
+    def spawn_attributes(self):
+        """
+        Returns:
+            attributes (dict): Attribute values for one spawned object.
+        """
+        attributes = dict(self.attributes)
+        for key, value in self.dynamic_attributes.items():
+            attributes[key] = value()
+        return attributes
+
+    def apply_extras(self, obj):
+        """
+        Set the parts of the template that aren't passed to create_object on a spawned object.
+        """
+        for tag in self.tags:
+            obj.tags.add(*tag)
+        if self.permissions:
+            obj.permissions.add(self.permissions)
+        for key, value in self.nattributes.items():
+            obj.nattributes.add(key, value() if callable(value) else value)
+
+
+def load_prototypes():
+    """
+    Returns:
+        prototypes (dict): Raw prototypes by name from every prototype module.
+    """
+    prototypes = {}
+    for module in make_iter(settings.PROTOTYPE_MODULES):
+        prototypes.update((key, value) for key, value in all_from_module(module).items() if isinstance(value, dict))
+    return prototypes
+
+
+def flatten(name, prototypes, flattened, chain=()):
+    """
+    Merge a prototype with its parents. Later parents override earlier ones, and the prototype overrides them all.
+
+    Args:
+        name (str): Prototype to flatten.
+        prototypes (dict): Raw prototypes by name.
+        flattened (dict): Already flattened prototypes by name, filled in as we go.
+        chain (tuple): Prototypes that inherit from this one, to catch loops.
+
+    Raises:
+        ValueError: If the prototype inherits from itself or from a prototype that doesn't exist.
+    """
+    if name in flattened:
+        return flattened[name]
+    if name in chain:
+        raise ValueError("Prototype {} inherits from itself: {}".format(name, " -> ".join(chain + (name,))))
+    if name not in prototypes:
+        raise ValueError("Prototype {} doesn't exist, but {} inherits from it.".format(name, chain[-1]))
+
+    prototype = {}
+    # make_iter(None) is [None], so only look for parents when there are some
+    parents = prototypes[name].get("prototype")
+    if parents:
+        for parent in make_iter(parents):
+            prototype.update(flatten(parent, prototypes, flattened, chain + (name,)))
+    prototype.update(prototypes[name])
+    prototype.pop("prototype", None)
+
+    flattened[name] = prototype
+    return prototype
+
+
+def compile_templates(prototypes):
+    """
+    Returns:
+        templates (dict): SpawnTemplate by name for every prototype that's valid. Invalid ones are logged and left out.
+    """
+    templates = {}
+    flattened = {}
+    for name in sorted(prototypes):
+        try:
+            templates[name] = SpawnTemplate(name, flatten(name, prototypes, flattened))
+        except (ValueError, ImportError) as err:
+            logger.log_err("Skipping prototype {}: {}".format(name, err))
+    return templates
+
+
+# name -> SpawnTemplate, compiled the first time a template is needed
+SPAWN_TEMPLATES = None
+
+
+def spawn_template(name):
+    """
+    Args:
+        name (str): Prototype name, either as it's written in its module or in uppercase.
+
+    Returns:
+        template (SpawnTemplate): The compiled prototype, or None if there isn't a valid one by that name.
+    """
+    global SPAWN_TEMPLATES
+    if SPAWN_TEMPLATES is None:
+        SPAWN_TEMPLATES = compile_templates(load_prototypes())
+    return SPAWN_TEMPLATES.get(name) or SPAWN_TEMPLATES.get(name.upper())
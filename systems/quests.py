@@ -1,6 +1,253 @@
 from commands.command import Command
-from evennia.utils import evtable, logger, mod_import
-from utils.constants import QUEST_DIR, QUEST_NAME_CONST, QUEST_DESC_CONST
+from django.db.models import Count
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.tags import Tag
+from evennia.utils import evtable, logger
+import importlib
+import pkgutil
+from twisted.internet import reactor
+from utils.constants import QUEST_COMPLETE, QUEST_DIR, QUEST_NAME_CONST, QUEST_DESC_CONST, TAG_CATEGORY_QUEST_STAGE
+
+
+class QuestEvent(object):
+    """
+    Something happened to a character's progress on a quest.
+    """
+    def __init__(self, character, quest_name, old_stage, stage):
+        self.character = character
+        self.quest_name = quest_name
+        # None if the character hadn't started the quest, or has had their progress cleared
+        self.old_stage = old_stage
+        self.stage = stage
+
+
+class QuestStarted(QuestEvent):
+    pass
+
+
+class QuestAdvanced(QuestEvent):
+    pass
+
+
+class QuestCompleted(QuestEvent):
+    pass
+
+
+class QuestCleared(QuestEvent):
+    pass
+
+
+# Quest module function -> events it's subscribed to
+QUEST_MODULE_HOOKS = {
+    "at_quest_start": QuestStarted,
+    "at_quest_advance": QuestAdvanced,
+    "at_quest_complete": QuestCompleted,
+    "at_quest_clear": QuestCleared,
+}
+
+
+class QuestEventBus(object):
+    """
+    Tells whoever is interested when quest progress changes. Handlers subscribe to one quest or to all of them and to
+    one kind of event or all of them, and are indexed that way, so publishing only runs the handlers that care.
+    """
+    def __init__(self):
+        # (quest name or None for all quests, event class) -> handlers
+        self.subscribers = {}
+
+    def subscribe(self, handler, quest_name=None, event_type=QuestEvent):
+        """
+        Args:
+            handler (callable): Called with the event.
+            quest_name (str): Quest to listen to, or None for every quest.
+            event_type (class): Kind of event to listen to. QuestEvent means every kind.
+        """
+        handlers = self.subscribers.setdefault((quest_name, event_type), [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def unsubscribe(self, handler, quest_name=None, event_type=QuestEvent):
+        handlers = self.subscribers.get((quest_name, event_type))
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self.subscribers[(quest_name, event_type)]
+
+    def publish(self, event):
+        if not self.subscribers:
+            return
+        for event_type in (type(event), QuestEvent):
+            for quest_name in (event.quest_name, None):
+                for handler in list(self.subscribers.get((quest_name, event_type), ())):
+                    try:
+                        handler(event)
+                    except Exception:
+                        logger.log_trace("Quest event handler {} failed.".format(handler))
+
+
+QUEST_EVENTS = QuestEventBus()
+
+
+class QuestInfo(object):
+    """
+    What the game needs to know about one quest module.
+    """
+    def __init__(self, internal_name, module=None, error=None):
+        self.internal_name = internal_name
+        self.module = module
+        self.name = getattr(module, QUEST_NAME_CONST, None)
+        self.descs = list(getattr(module, QUEST_DESC_CONST, None) or [])
+        # Problems found when loading the quest
+        self.errors = [error] if error else []
+        # (function, event class) for each of the module's hooks subscribed to quest events
+        self.hooks = []
+
+        if module:
+            if getattr(module, "INTERNAL_NAME", None) != internal_name:
+                self.errors.append("INTERNAL_NAME doesn't match the file name.")
+            if not self.name:
+                self.errors.append("Missing {}, so it won't appear in quest logs.".format(QUEST_NAME_CONST))
+            if not self.descs:
+                self.errors.append("Missing {}.".format(QUEST_DESC_CONST))
+
+    def description(self, quest_status):
+        """
+        Returns:
+            desc (str): Description for a stage of the quest, or None if it doesn't have one.
+        """
+        if quest_status is None or not 0 <= quest_status < len(self.descs):
+            return None
+        return self.descs[quest_status]
+
+
+class QuestRegistry(object):
+    """
+    Every quest module in world/quests, imported once when the server starts.
+    """
+    def __init__(self):
+        # internal name -> QuestInfo
+        self.quests = None
+
+    def load(self):
+        """
+        Find and check every quest module. Called at server start.
+        """
+        quests = {}
+        package = importlib.import_module(QUEST_DIR.rstrip("."))
+        for _, internal_name, is_package in pkgutil.iter_modules(package.__path__):
+            if is_package or internal_name.startswith("_"):
+                continue
+            try:
+                quest = QuestInfo(internal_name, importlib.import_module(QUEST_DIR + internal_name))
+            except Exception as e:
+                quest = QuestInfo(internal_name, error="Failed to import: {}".format(e))
+            for error in quest.errors:
+                logger.log_err("Quest {}: {}".format(internal_name, error))
+            quests[internal_name] = quest
+
+        self.unsubscribe_hooks()
+        self.quests = quests
+        for quest in quests.values():
+            if quest.module:
+                self.subscribe_hooks(quest)
+
+    def all(self):
+        """
+        Returns:
+            quests (list): Every quest, sorted by internal name.
+        """
+        if self.quests is None:
+            self.load()
+        return [self.quests[name] for name in sorted(self.quests)]
+
+    def subscribe_hooks(self, quest):
+        """
+        Subscribe a quest module's at_quest_* functions to its own quest's events.
+        """
+        for hook_name, event_type in QUEST_MODULE_HOOKS.items():
+            hook = getattr(quest.module, hook_name, None)
+            if callable(hook):
+                QUEST_EVENTS.subscribe(hook, quest.internal_name, event_type)
+                quest.hooks.append((hook, event_type))
+
+    def unsubscribe_hooks(self):
+        for quest in (self.quests or {}).values():
+            for hook, event_type in quest.hooks:
+                QUEST_EVENTS.unsubscribe(hook, quest.internal_name, event_type)
+
+    def get(self, internal_name):
+        """
+        Returns:
+            quest (QuestInfo): The quest, or None if there's no quest module by that name.
+        """
+        if self.quests is None:
+            self.load()
+        return self.quests.get(internal_name)
+
+
+QUEST_REGISTRY = QuestRegistry()
+
+
+class QuestLockCache(object):
+    """
+    Results of quest locks for the command being run. A single look can check the same quest lock on every exit and
+    NPC in the room, so results are kept until the current reactor turn is over or the character's quest progress
+    changes, whichever comes first.
+    """
+    def __init__(self):
+        # character id -> {lock args: result}
+        self.results = {}
+        self.clear_pending = False
+
+    def get(self, character, key):
+        results = self.results.get(character.id)
+        return results.get(key) if results else None
+
+    def set(self, character, key, result):
+        if not self.clear_pending:
+            reactor.callLater(0, self.clear)
+            self.clear_pending = True
+        self.results.setdefault(character.id, {})[key] = result
+
+    def forget(self, character):
+        """
+        Called when a character's quest progress changes.
+        """
+        self.results.pop(character.id, None)
+
+    def clear(self):
+        self.results = {}
+        self.clear_pending = False
+
+
+QUEST_LOCKS = QuestLockCache()
+
+
+def stage_counts(quest_name):
+    """
+    Count characters at each stage of a quest, without loading any of them.
+
+    Returns:
+        counts (dict): Number of characters by stage.
+    """
+    prefix = TAG_CATEGORY_QUEST_STAGE.format("")
+    tags = Tag.objects.filter(db_key=quest_name, db_category__startswith=prefix)
+    counts = {}
+    # Removing a tag from a character only unlinks it, so stages nobody is at anymore still have a tag with no objects
+    tags = tags.annotate(count=Count("objectdb")).filter(count__gt=0)
+    for category, count in tags.values_list("db_category", "count"):
+        counts[int(category[len(prefix):])] = count
+    return counts
+
+
+def migrate_quest_attributes():
+    """
+    Move quest progress out of the old "quests" Attribute for characters who haven't logged in since progress moved
+    to tags. Called at server start.
+    """
+    for obj in ObjectDB.objects.get_objs_with_attr("quests"):
+        if hasattr(obj, "migrate_quest_attribute"):
+            obj.migrate_quest_attribute()
 
 
 class CmdQuests(Command):
@@ -22,29 +269,27 @@ class CmdQuests(Command):
         Lists out your quests.
         """
         table = evtable.EvTable("Quest", "Description", border="cells", maxwidth=80)
-        for quest, quest_status in self.caller.db.quests.items():
-            try:
-                quest_module = mod_import(QUEST_DIR + quest)
-            except Exception as e:
-                logger.log_err("Failed to import module {}: e".format(QUEST_DIR + quest, e))
-                continue
-
+        for quest, quest_status in self.caller.quests().items():
             # Quest already completed
             if not quest_status:
                 continue
 
+            # Problems loading the quest were logged when the registry loaded
+            quest_info = QUEST_REGISTRY.get(quest)
+            if not quest_info or not quest_info.module:
+                continue
+
             # If we're missing the quest name then we skip displaying it
-            quest_name = getattr(quest_module, QUEST_NAME_CONST, None)
-            if not quest_name:
+            if not quest_info.name:
                 continue
 
             # Skip the description if it's not present
-            quest_descs = getattr(quest_module, QUEST_DESC_CONST, None)
-            if not quest_descs or len(quest_descs) < quest_status + 1:
+            quest_desc = quest_info.description(quest_status)
+            if quest_desc is None:
                 logger.log_warn("Quest {} missing description for progression {}.".format(quest, quest_status))
                 continue
 
-            table.add_row(quest_name, quest_descs[quest_status])
+            table.add_row(quest_info.name, quest_desc)
 
         if table.nrows < 2:
             self.caller.msg("No active quests.")
@@ -58,16 +303,22 @@ class CmdQuestSet(Command):
     Resets a quest you have progress in.
 
     Usage:
-      @questset [<player_name>/]<quest_name> = <quest_status>
+      @questset[/hooks] [<player_name>/]<quest_name> = <quest_status>
+      @questset/list
     Example:
       @questset tutorial =
       @questset tutorial = 0
-      @questset Madler/tutorial = 3
+      @questset/hooks Madler/tutorial = 3
 
     Setting to 0 marks a quest as completed.
     Setting to positive integers marks it as that progress status.
     Setting to anything else clears all data for that quest.
     Optionally setting a player sets quest progress on another character.
+    Quest hooks (such as a quest cleaning up after itself when completed) don't
+    run unless the hooks switch is given, so fixing up progress doesn't touch
+    anything else.
+    The list switch shows every quest in the game, how many characters are at each
+    stage, and any problems loading it.
     """
     key = "@questset"
     locks = "cmd:perm(questset) or perm(Builders)"
@@ -77,6 +328,17 @@ class CmdQuestSet(Command):
         """
         Lists out your quests.
         """
+        if "list" in self.switches:
+            table = evtable.EvTable("Quest", "Name", "Characters by Stage", "Problems", border="cells", maxwidth=80)
+            for quest_info in QUEST_REGISTRY.all():
+                counts = stage_counts(quest_info.internal_name)
+                progress = ", ".join("{}: {}".format("done" if stage == QUEST_COMPLETE else stage, counts[stage])
+                                     for stage in sorted(counts)) or "None"
+                table.add_row(quest_info.internal_name, quest_info.name or "", progress,
+                              " ".join(quest_info.errors) or "None")
+            self.caller.msg("|wQuests|n\n{}".format(table))
+            return
+
         if not self.lhs or self.rhs is None:
             self.caller.msg("Usage: @questset <quest_name> = <quest_status>")
             return
@@ -93,12 +355,14 @@ class CmdQuestSet(Command):
 
         try:
             value = int(self.rhs)
-            target.db.quests[quest_name] = value
+            if not QUEST_REGISTRY.get(quest_name):
+                self.caller.msg("There's no quest named {}, see @questset/list.".format(quest_name))
+                return
+            target.quest_advance(quest_name, value, publish="hooks" in self.switches)
             target.msg("Set quest status on {} for {} to {}.".format(target.name, quest_name, self.rhs))
             return
         except ValueError:
-            if quest_name in target.db.quests:
-                del target.db.quests[quest_name]
+            if target.quest_clear(quest_name, publish="hooks" in self.switches):
                 self.caller.msg("Deleted quest progress on {} for {}.".format(target.name, quest_name))
             else:
                 self.caller.msg("Failed to find quest {} on {}, could not delete progress.".format(
@@ -1,16 +1,27 @@
 from commands.command import Command
 from datetime import datetime, timedelta
+from django.db import connection, transaction
 from evennia.commands.default.building import _convert_from_string
-from evennia.locks.lockhandler import LockHandler
-from evennia.scripts.models import ScriptDB
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.attributes import Attribute
+from evennia.utils import logger
 from evennia.utils.create import create_object, create_script
+from evennia.utils.dbserialize import to_pickle
 from evennia.utils.evtable import EvTable
 from evennia.utils.search import search_script_tag
 from evennia.utils.utils import class_from_module
+import random
 import re
+import time
 from systems.command_overrides import CmdCreate
+from systems.prototypes import spawn_template
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
 from typeclasses.scripts import Script
-from utils.constants import RESPAWN_RATE_DEFAULT, RESPAWN_TICK_RATE, TAG_CATEGORY_BUILDING
+from utils.constants import RESPAWN_RATE_DEFAULT, RESPAWN_RESOLUTION, RESPAWN_RETRY_MAX, RESPAWN_START_SPREAD, \
+    TAG_CATEGORY_BUILDING
+from utils.lock_cache import InternedLockHandler
+from utils.timing_wheel import TimingWheel
 
 
 SPAWNER_PREFIX = "spawner_"
@@ -25,10 +36,10 @@ class CmdSpawner(Command):
     Usage:
       @spawner
         lists detailed info for all spawner scripts in the current location
-      @spawner <obj name>[;alias1;alias2] = <class path>
+      @spawner <obj name>[;alias1;alias2] = <class path or prototype>
         creates a spawner that immediately starts respawning objects
-      @spawner/all
-        lists all spawners in the game and their locations.
+      @spawner/all [<class path>]
+        lists all spawners in the game and their locations, optionally only those spawning the given class.
       @spawner/spawn <script #>
         forces a spawner to immediately spawn
       @spawner/del <script #>
@@ -39,8 +50,12 @@ class CmdSpawner(Command):
         add aliases for the things a spawner spawns
       @spawner/type <script #> = <class path>
         change the type of the things a spawner spawns
+      @spawner/prototype <script #>[ = <prototype>]
+        spawn from a prototype in world/prototypes.py, or stop using one; the spawner's own settings still apply on top
       @spawner/rate <script #> = <num seconds>
         set the number of seconds it takes for something to respawn, 0 for instant
+      @spawner/population <script #> = <count>[, <jitter seconds>]
+        keep several objects spawned at once, optionally adding up to <jitter seconds> to each respawn at random
       @spawner/set <script #>/<attr>[ = <value>]
         view, set, or unset what attributes should be present on spawned objects
       @spawner/setclear <script #>
@@ -51,6 +66,8 @@ class CmdSpawner(Command):
         delete locks that would otherwise be present on spawned objects
       @spawner/lockreset <script #>
         reset locks back to default on spawned objects
+      @spawner/pool <script #>[ = on/off]
+        check or toggle pooling, where deleted objects are parked off-grid and reused on respawn
     """
     key = "@spawner"
     aliases = ["@spawners"]
@@ -58,15 +75,7 @@ class CmdSpawner(Command):
     help_category = "Building"
 
     def find_spawner(self, id):
-        scripts = ScriptDB.objects.get_all_scripts(key=id)
-        if not scripts:
-            # Try to see if they're searching by name
-            scripts = ScriptDB.objects.get_all_scripts(key=Spawner.get_key(id))
-
-        spawners = []
-        for script in scripts:
-            if isinstance(script, Spawner):
-                spawners.append(script)
+        spawners = SPAWNER_REGISTRY.find(id)
 
         if len(spawners) < 1:
             self.caller.msg("Spawner {} not found, please specify using \"#<dbref>\".".format(id))
@@ -80,7 +89,10 @@ class CmdSpawner(Command):
 
     def func(self):
         if 'all' in self.switches:
-            spawners = search_script_tag(SPAWNER_TAG, TAG_CATEGORY_BUILDING)
+            if self.args:
+                spawners = SPAWNER_REGISTRY.of_type(self.args)
+            else:
+                spawners = SPAWNER_REGISTRY.all()
 
             if len(spawners) == 0:
                 self.caller.msg("No spawners exist.")
@@ -109,10 +121,7 @@ class CmdSpawner(Command):
         if not self.switches:
             if not self.rhs:
                 # List out details for all spawners in the current room
-                spawners = []
-                for script in caller.location.scripts.all():
-                    if isinstance(script, Spawner):
-                        spawners.append(script)
+                spawners = SPAWNER_REGISTRY.in_location(caller.location)
 
                 if len(spawners) == 0:
                     self.caller.msg("No spawners are present in this location.")
@@ -124,8 +133,11 @@ class CmdSpawner(Command):
                     output += separator
                     output += "\nScript Name: {} ({})".format(spawner.key, spawner.dbref)
                     output += "\nSpawn Target: {} ({})".format(spawner.db.spawn_name, spawner.db.spawn_type)
+                    output += "\nPrototype: {}".format(spawner.db.prototype or "None")
                     output += "\nAliases: {}".format(','.join(spawner.db.aliases))
                     output += "\nRespawn Timer: {}".format(spawner.respawn_timer())
+                    output += "\nPopulation: {} (up to {} seconds of jitter)".format(
+                        spawner.population, spawner.respawn_jitter)
                     output += "\nSpawned Attributes:"
                     if not spawner.db.attributes:
                         output += " None"
@@ -133,17 +145,21 @@ class CmdSpawner(Command):
                         for key, value in spawner.db.attributes.items():
                             output += "\n    {}: {}".format(key, value)
                     output += "\nLocks: {}".format(spawner.db.lockstring)
+                    output += "\nPooling: {}".format(spawner.pool_status())
                 self.caller.msg(output)
 
                 return
 
             # Create a new spawner
-            try:
-                class_from_module(self.rhs)
-            except ImportError:
-                caller.msg("{} is not a valid class path.\n"
-                           "Usage: @spawner <obj name>[;alias1;alias2] = <class path>".format(self.rhs))
-                return
+            template = spawn_template(self.rhs)
+            if not template:
+                try:
+                    spawn_class(self.rhs)
+                except ImportError:
+                    caller.msg("{} is not a valid class path or prototype.\n"
+                               "Usage: @spawner <obj name>[;alias1;alias2] = <class path or prototype>".format(
+                                   self.rhs))
+                    return
 
             aliases = self.lhs.split(';')
             spawn_name = aliases.pop(0)
@@ -152,15 +168,17 @@ class CmdSpawner(Command):
             spawner = create_script(typeclass=Spawner,
                                     key=Spawner.get_key(spawn_name),
                                     obj=caller.location,
-                                    interval=RESPAWN_TICK_RATE,
-                                    start_delay=True,
                                     persistent=True,
                                     autostart=False,
                                     desc="Respawns target on a cadence if target is missing.")
             spawner.tags.add(SPAWNER_TAG, TAG_CATEGORY_BUILDING)
             spawner.db.spawn_name = spawn_name
             spawner.db.aliases = aliases
-            spawner.db.spawn_type = self.rhs
+            if template:
+                spawner.db.prototype = template.name
+                spawner.db.spawn_type = template.typeclass
+            else:
+                spawner.db.spawn_type = self.rhs
 
             spawner.start()
             caller.msg("Successfully started spawner {}({})".format(spawner.db.spawn_name, spawner.dbref))
@@ -197,6 +215,7 @@ class CmdSpawner(Command):
 
             spawner.db.spawn_name = spawn_name
             spawner.key = Spawner.get_key(spawn_name)
+            SPAWNER_REGISTRY.add(spawner)
 
             caller.msg("Renamed spawn target for spawner {} to be {}".format(spawner.dbref, spawn_name))
             return
@@ -222,17 +241,57 @@ class CmdSpawner(Command):
                 return
 
             try:
-                spawn_class = class_from_module(self.rhs)
+                new_class = spawn_class(self.rhs)
             except ImportError:
                 caller.msg("{} is not a valid class path, not changing spawn class.".format(self.rhs))
                 return
 
             spawner.db.spawn_type = self.rhs
-            spawner.ndb.spawn_class = spawn_class
+            spawner.ndb.spawn_class = new_class
+            SPAWNER_REGISTRY.add(spawner)
+            SPAWNER_ENGINE.spawn_type_changed(spawner)
 
             caller.msg("Changed spawner class for {}({}) to be {}".format(
                 spawner.db.spawn_name, spawner.dbref, self.rhs))
             return
+        elif "prototype" in self.switches:
+            if not self.rhs:
+                spawner.db.prototype = None
+                spawner.prototype_changed()
+                SPAWNER_ENGINE.spawn_type_changed(spawner)
+                caller.msg("Spawner {}({}) no longer uses a prototype.".format(spawner.db.spawn_name, spawner.dbref))
+                return
+
+            template = spawn_template(self.rhs)
+            if not template:
+                caller.msg("{} is not a valid prototype, not changing prototype.".format(self.rhs))
+                return
+
+            spawner.db.prototype = template.name
+            spawner.db.spawn_type = template.typeclass
+            spawner.ndb.spawn_class = spawn_class(template.typeclass)
+            spawner.prototype_changed()
+            SPAWNER_REGISTRY.add(spawner)
+            SPAWNER_ENGINE.spawn_type_changed(spawner)
+            caller.msg("Spawner {}({}) now spawns from prototype {} ({}).".format(
+                spawner.db.spawn_name, spawner.dbref, template.name, template.typeclass))
+            return
+        elif "population" in self.switches:
+            try:
+                population_split = [int(value) for value in (self.rhs or "").split(",")]
+            except ValueError:
+                population_split = []
+            if not 1 <= len(population_split) <= 2 or population_split[0] < 1 or min(population_split) < 0:
+                caller.msg("Usage: @spawner/population <script #> = <count>[, <jitter seconds>]")
+                return
+
+            spawner.db.population = population_split[0]
+            if len(population_split) > 1:
+                spawner.db.respawn_jitter = population_split[1]
+            SPAWNER_ENGINE.population_changed(spawner)
+            caller.msg("Spawner {}({}) now keeps {} spawned with up to {} seconds of respawn jitter.".format(
+                spawner.db.spawn_name, spawner.dbref, spawner.population, spawner.respawn_jitter))
+            return
         elif "rate" in self.switches:
             spawner.respawn_rate = int(self.rhs)
             caller.msg("Changed respawn rate for {}({}) to be {} seconds.".format(
@@ -285,10 +344,469 @@ class CmdSpawner(Command):
             spawner.reset_locks()
             caller.msg("Reset locks to default on spawner {}({})".format(spawner.db.spawn_name, spawner.dbref))
             return
+        elif "pool" in self.switches:
+            if self.rhs:
+                toggle = self.rhs.strip().lower()
+                if toggle not in ("on", "off"):
+                    caller.msg("Usage: @spawner/pool <script #>[ = on/off]")
+                    return
+                spawner.db.pooled = toggle == "on"
+                if not spawner.db.pooled:
+                    SPAWNER_ENGINE.drain_pool(spawner)
+            caller.msg("Pooling for spawner {}({}): {}".format(
+                spawner.db.spawn_name, spawner.dbref, spawner.pool_status()))
+            return
         else:
             caller.msg("Invalid switch. Type \"help @spawner\" for a list of valid switches.")
             return
 
+class SpawnerEngine(object):
+    """
+    Drives every spawner from one in-memory loop. Spawner scripts don't tick on their own; instead spawned objects
+    tell the engine when they leave their spawner's location or get deleted, and the engine puts that spawner's respawn
+    deadline on a hierarchical timing wheel, so work is only done for spawners that are actually due.
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        # spawner id -> Spawner
+        self.spawners = {}
+        # spawner id -> {object id: object} for everything the spawner spawned that hasn't been replaced yet
+        self.instances = {}
+        # spawner id -> {object id: object} parked off-grid for pooled spawners to reuse
+        self.pools = {}
+        # ids of spawners waiting on their first check
+        self.starting = set()
+        # spawner id -> how many times in a row it has failed to settle or respawn
+        self.failures = {}
+        self.wheel = TimingWheel(clock(), resolution=RESPAWN_RESOLUTION)
+        self.loop = None
+
+    def start(self):
+        """
+        Start advancing the wheel. Called at server start.
+        """
+        if self.loop and self.loop.running:
+            return
+        self.loop = LoopingCall(self.tick)
+        self.loop.start(RESPAWN_RESOLUTION, now=False)
+
+    def stop(self):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        self.loop = None
+
+    def register(self, spawner):
+        """
+        Start tracking a spawner. Every spawner registers at once when the server starts or reloads, so the first check
+        on each one's target is spread out at random over the next few seconds.
+        """
+        self.spawners[spawner.id] = spawner
+        self.starting.add(spawner.id)
+        self.wheel.schedule(spawner.id, self.clock() + random.uniform(0, RESPAWN_START_SPREAD))
+
+    def settle(self, spawner):
+        """
+        First check on a spawner after it starts. This is the only time we go to the database to find out what it has
+        spawned.
+        """
+        self.starting.discard(spawner.id)
+        if self.deficit(spawner) <= 0:
+            if spawner.db.respawn_at:
+                spawner.db.respawn_at = None
+        else:
+            self.arm(spawner)
+
+    def unregister(self, spawner):
+        self.spawners.pop(spawner.id, None)
+        self.instances.pop(spawner.id, None)
+        self.pools.pop(spawner.id, None)
+        self.starting.discard(spawner.id)
+        self.failures.pop(spawner.id, None)
+        self.wheel.cancel(spawner.id)
+
+    def reconcile(self, spawner):
+        """
+        Load everything a spawner has spawned that's still in its location into memory.
+        """
+        spawned_ids = spawner.db.spawned
+        if spawned_ids:
+            instances = dict((obj.id, obj) for obj in ObjectDB.objects.filter(id__in=spawned_ids)
+                             if obj.location == spawner.obj)
+        else:
+            # Spawners from before we kept track of what they spawned can only go by name
+            target = spawner.find_target()
+            instances = {target.id: target} if target else {}
+            for obj in instances.values():
+                if not obj.db.spawner:
+                    obj.db.spawner = spawner
+
+        self.instances[spawner.id] = instances
+        self.save_instances(spawner)
+        return instances
+
+    def instances_for(self, spawner):
+        """
+        Returns:
+            instances (dict): Objects by id that the spawner spawned and hasn't replaced yet.
+        """
+        instances = self.instances.get(spawner.id)
+        if instances is None:
+            instances = self.reconcile(spawner)
+        return instances
+
+    def save_instances(self, spawner):
+        spawned_ids = sorted(self.instances.get(spawner.id, {}))
+        if spawner.db.spawned != spawned_ids:
+            spawner.db.spawned = spawned_ids
+
+    def deficit(self, spawner):
+        """
+        Returns:
+            deficit (int): How many more objects the spawner needs in its location to reach its population.
+        """
+        present = 0
+        for obj in self.instances_for(spawner).values():
+            if obj.location == spawner.obj:
+                present += 1
+        return spawner.population - present
+
+    def add_instances(self, spawner, objs):
+        """
+        Called when a spawner spawns something.
+        """
+        # Anything that already left has been replaced, so we no longer count it
+        instances = self.instances_for(spawner)
+        for obj_id, instance in list(instances.items()):
+            if instance.location != spawner.obj:
+                del instances[obj_id]
+        for obj in objs:
+            instances[obj.id] = obj
+        self.save_instances(spawner)
+        self.starting.discard(spawner.id)
+        self.wheel.cancel(spawner.id)
+        # A partial spawn still leaves the spawner short
+        if spawner.id in self.spawners and self.deficit(spawner) > 0:
+            self.arm(spawner)
+
+    def target_removed(self, spawner, obj, deleted=False):
+        """
+        Called when something a spawner spawned leaves its location or is deleted.
+        """
+        if spawner.id not in self.spawners:
+            return
+        if deleted:
+            if obj.id not in self.instances_for(spawner):
+                # Already replaced, or parked in the pool
+                return
+            del self.instances[spawner.id][obj.id]
+            self.save_instances(spawner)
+        # Spawners that are still starting up will check on their own
+        if spawner.id not in self.wheel and self.deficit(spawner) > 0:
+            self.arm(spawner)
+
+    def pool_for(self, spawner):
+        """
+        Returns:
+            pool (dict): Objects by id parked off-grid for the spawner to reuse.
+        """
+        pool = self.pools.get(spawner.id)
+        if pool is None:
+            pool_ids = spawner.db.pool
+            pool = {}
+            if pool_ids:
+                pool = dict((obj.id, obj) for obj in ObjectDB.objects.filter(id__in=pool_ids) if obj.location is None)
+            self.pools[spawner.id] = pool
+            self.save_pool(spawner)
+        return pool
+
+    def save_pool(self, spawner):
+        pool_ids = sorted(self.pools.get(spawner.id, {}))
+        if spawner.db.pool != pool_ids:
+            spawner.db.pool = pool_ids
+
+    def park(self, spawner, obj):
+        """
+        Called when something a spawner spawned is about to be deleted. Pooled spawners move it off-grid to reuse
+        instead.
+
+        Returns:
+            parked (bool): True if the object was parked and shouldn't be deleted.
+        """
+        # Anything already off-grid is being deleted for real
+        if spawner.id not in self.spawners or not spawner.db.pooled or obj.location is None:
+            return False
+
+        obj.move_to(None, quiet=True, to_none=True)
+        self.instances_for(spawner).pop(obj.id, None)
+        self.save_instances(spawner)
+        self.pool_for(spawner)[obj.id] = obj
+        self.save_pool(spawner)
+        return True
+
+    def unpark(self, spawner):
+        """
+        Take an object out of a spawner's pool to reuse it.
+
+        Returns:
+            obj (Object): A parked object of the spawner's current type, or None if there isn't one.
+        """
+        pool = self.pool_for(spawner)
+        while pool:
+            _, obj = pool.popitem()
+            self.save_pool(spawner)
+            if obj.is_typeclass(spawner.db.spawn_type, exact=True):
+                return obj
+            # Parked before the spawner's type changed
+            obj.delete()
+        return None
+
+    def drain_pool(self, spawner):
+        """
+        Delete everything parked in a spawner's pool.
+        """
+        pool = self.pool_for(spawner)
+        for obj in list(pool.values()):
+            obj.delete()
+        pool.clear()
+        self.save_pool(spawner)
+
+    def population_changed(self, spawner):
+        """
+        Called when a spawner's population changes, which may leave it short.
+        """
+        if spawner.id in self.spawners and spawner.id not in self.starting and spawner.id not in self.wheel and \
+                self.deficit(spawner) > 0:
+            self.arm(spawner)
+
+    def spawn_type_changed(self, spawner):
+        """
+        Called when what a spawner spawns changes. Anything parked was made the old way, and a spawner that was failing
+        or sitting idle may be able to spawn now.
+        """
+        if spawner.id not in self.spawners:
+            return
+        self.drain_pool(spawner)
+        self.failures.pop(spawner.id, None)
+        if spawner.id not in self.starting and self.deficit(spawner) > 0:
+            self.arm(spawner)
+
+    def reschedule(self, spawner):
+        """
+        Called when a spawner's settings change in a way that affects when it should respawn.
+        """
+        if spawner.id in self.wheel and spawner.id not in self.starting:
+            self.arm(spawner)
+
+    def arm(self, spawner):
+        """
+        Schedule a spawner to respawn its target.
+        """
+        if not spawner.db.respawn_at:
+            delay = spawner.respawn_rate + random.uniform(0, spawner.respawn_jitter)
+            spawner.db.respawn_at = datetime.now() + timedelta(seconds=delay)
+        remaining = (spawner.db.respawn_at - datetime.now()).total_seconds()
+        self.wheel.schedule(spawner.id, self.clock() + max(0, remaining))
+
+    def tick(self):
+        for spawner_id in self.wheel.advance(self.clock()):
+            spawner = self.spawners.get(spawner_id)
+            if not spawner:
+                continue
+            try:
+                if spawner_id in self.starting:
+                    self.settle(spawner)
+                else:
+                    self.respawn(spawner)
+                self.failures.pop(spawner_id, None)
+            except Exception as e:
+                logger.log_trace("Spawner {} failed to respawn: {}".format(spawner_id, e))
+                self.retry(spawner)
+
+    def retry(self, spawner):
+        """
+        Try a spawner that failed again later, backing off the more times in a row it fails, so fixing its data brings
+        it back without a reload.
+        """
+        failures = self.failures.get(spawner.id, 0) + 1
+        self.failures[spawner.id] = failures
+        delay = min(RESPAWN_RESOLUTION * 2 ** min(failures, 16), RESPAWN_RETRY_MAX)
+        self.wheel.schedule(spawner.id, self.clock() + delay)
+
+    def respawn(self, spawner):
+        """
+        A spawner's respawn deadline has come up.
+        """
+        deficit = self.deficit(spawner)
+        if deficit <= 0:
+            # Someone brought them back in the meantime
+            spawner.db.respawn_at = None
+            return
+
+        respawn_at = spawner.db.respawn_at
+        if not respawn_at or datetime.now() >= respawn_at:
+            spawner.spawn_targets(deficit)
+        else:
+            self.arm(spawner)
+
+
+class SpawnerRegistry(object):
+    """
+    Every spawner in the game, indexed by id, spawn name, location and spawn type so builder commands can find them
+    without going to the database. Spawners add themselves when they start and remove themselves when they stop, and
+    CmdSpawner tells the registry when it renames or retypes one.
+    """
+    def __init__(self):
+        # spawner id -> Spawner
+        self.spawners = {}
+        # spawner id -> (name, location id, spawn type) it's currently indexed under
+        self.keys = {}
+        # lowercase spawn name -> set of spawner ids
+        self.by_name = {}
+        # location id -> set of spawner ids
+        self.by_location = {}
+        # spawn type class path -> set of spawner ids
+        self.by_type = {}
+
+    def __len__(self):
+        return len(self.spawners)
+
+    def load(self):
+        """
+        Index every spawner in the database. Called at server start.
+        """
+        for spawner in search_script_tag(SPAWNER_TAG, TAG_CATEGORY_BUILDING):
+            if isinstance(spawner, Spawner):
+                self.add(spawner)
+
+    def add(self, spawner):
+        """
+        Start indexing a spawner, or reindex it if its name or type changed.
+        """
+        self.remove(spawner)
+        keys = ((spawner.db.spawn_name or "").lower(), spawner.obj.id if spawner.obj else None, spawner.db.spawn_type)
+        self.spawners[spawner.id] = spawner
+        self.keys[spawner.id] = keys
+        for index, key in zip((self.by_name, self.by_location, self.by_type), keys):
+            index.setdefault(key, set()).add(spawner.id)
+
+    def remove(self, spawner):
+        self.spawners.pop(spawner.id, None)
+        keys = self.keys.pop(spawner.id, None)
+        if not keys:
+            return
+        for index, key in zip((self.by_name, self.by_location, self.by_type), keys):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(spawner.id)
+                if not ids:
+                    del index[key]
+
+    def lookup(self, index, key):
+        return sorted((self.spawners[spawner_id] for spawner_id in index.get(key, ())), key=lambda s: s.id)
+
+    def all(self):
+        """
+        Returns:
+            spawners (list): Every spawner, grouped by location.
+        """
+        return sorted(self.spawners.values(), key=lambda s: (s.obj.id if s.obj else 0, s.id))
+
+    def get(self, dbref):
+        """
+        Args:
+            dbref (str or int): Spawner script id, with or without the leading #.
+        """
+        try:
+            return self.spawners.get(int(str(dbref).lstrip("#")))
+        except ValueError:
+            return None
+
+    def named(self, spawn_name):
+        return self.lookup(self.by_name, spawn_name.lower())
+
+    def in_location(self, location):
+        return self.lookup(self.by_location, location.id)
+
+    def of_type(self, spawn_type):
+        return self.lookup(self.by_type, spawn_type)
+
+    def find(self, query):
+        """
+        Find spawners by dbref, spawn name, or spawner script key.
+
+        Returns:
+            spawners (list): Every spawner that matched.
+        """
+        spawner = self.get(query)
+        if spawner:
+            return [spawner]
+        spawners = self.named(query)
+        if not spawners and query.startswith(SPAWNER_PREFIX):
+            spawners = self.named(query[len(SPAWNER_PREFIX):])
+        return spawners
+
+
+SPAWNER_ENGINE = SpawnerEngine()
+SPAWNER_REGISTRY = SpawnerRegistry()
+# class path -> class, so spawners sharing a type only import it once
+SPAWN_CLASSES = {}
+
+
+def spawn_class(class_path):
+    """
+    Resolve a spawner's class path to its class, reusing earlier lookups.
+
+    Raises:
+        ImportError: If the class path doesn't point to a class.
+    """
+    cls = SPAWN_CLASSES.get(class_path)
+    if cls is None:
+        cls = class_from_module(class_path)
+        SPAWN_CLASSES[class_path] = cls
+    return cls
+
+
+def bulk_insert_returns_ids():
+    """
+    Returns:
+        returns_ids (bool): Whether the database hands back primary keys from a bulk insert (PostgreSQL does, SQLite and
+            MySQL don't).
+    """
+    return getattr(connection.features, "can_return_ids_from_bulk_insert", False)
+
+
+def add_attributes(obj, attributes):
+    """
+    Add many Attributes to an object at once. Attributes the object doesn't have yet are inserted in one bulk insert
+    where the database can return their primary keys, and linked to the object in another. Call this inside a
+    transaction so every row goes in together.
+
+    Args:
+        obj (Object): Object to add the Attributes to.
+        attributes (dict): Attribute values by key.
+    """
+    existing = set(attr.key for attr in obj.attributes.all())
+    new_attributes = []
+    for key, value in attributes.items():
+        if key in existing:
+            obj.attributes.add(key, value)
+        else:
+            new_attributes.append(Attribute(db_key=key, db_value=to_pickle(value), db_model="objectdb"))
+
+    if new_attributes:
+        if bulk_insert_returns_ids():
+            new_attributes = Attribute.objects.bulk_create(new_attributes)
+        else:
+            # Without primary keys the rows can't be linked, so they're saved one at a time
+            for attribute in new_attributes:
+                attribute.save()
+        obj.db_attributes.add(*new_attributes)
+        # The handler doesn't know about Attributes linked behind its back
+        obj.attributes.reset_cache()
+        if hasattr(obj.attributes, "changed"):
+            obj.attributes.changed(*[attribute.db_key for attribute in new_attributes])
+
+
 class Spawner(Script):
     class LockHolder(object):
         """
@@ -296,23 +814,65 @@ class Spawner(Script):
         """
         def __init__(self, lockstring):
             self.lock_storage = ""
-            self.locks = LockHandler(self)
+            self.locks = InternedLockHandler(self)
             self.locks.add(lockstring)
 
+    @property
+    def lock_holder(self):
+        """
+        Built the first time it's needed rather than when the spawner starts.
+        """
+        if self.ndb.lock_holder is None:
+            self.ndb.lock_holder = Spawner.LockHolder(self.db.lockstring)
+        return self.ndb.lock_holder
+
+    @property
+    def template(self):
+        """
+        The compiled prototype this spawner spawns from, if any.
+        """
+        if self.ndb.template is None and self.db.prototype:
+            self.ndb.template = spawn_template(self.db.prototype)
+            if not self.ndb.template:
+                logger.log_err("Spawner {} can't find prototype {}.".format(self.dbref, self.db.prototype))
+        return self.ndb.template
+
+    @property
+    def spawn_lockstring(self):
+        """
+        Locks for spawned objects: the prototype's, with the spawner's own layered on top.
+        """
+        if self.ndb.spawn_lockstring is None:
+            template = self.template
+            if template and template.locks:
+                merged = Spawner.LockHolder(template.locks)
+                merged.locks.add(str(self.lock_holder.locks))
+                self.ndb.spawn_lockstring = str(merged.locks)
+            else:
+                self.ndb.spawn_lockstring = str(self.lock_holder.locks)
+        return self.ndb.spawn_lockstring
+
+    def prototype_changed(self):
+        self.ndb.template = None
+        self.ndb.spawn_lockstring = None
+
     def add_lock(self, lockstring):
         # OVERRIDE: evennia.commands.default.building.CmdLock.func
         lockstring = re.sub(r"\'|\"", "", lockstring)
-        self.ndb.lock_holder.locks.add(lockstring)
-        self.db.lockstring = str(self.ndb.lock_holder.locks)
+        self.lock_holder.locks.add(lockstring)
+        self.db.lockstring = str(self.lock_holder.locks)
+        self.ndb.spawn_lockstring = None
 
     def remove_lock(self, lock_type):
-        self.ndb.lock_holder.locks.remove(lock_type)
-        self.db.lockstring = str(self.ndb.lock_holder.locks)
+        self.lock_holder.locks.remove(lock_type)
+        self.db.lockstring = str(self.lock_holder.locks)
+        self.ndb.spawn_lockstring = None
 
     def reset_locks(self):
         self.db.lockstring = CmdCreate.new_obj_lockstring
-        self.ndb.lock_holder.locks.clear()
-        self.ndb.lock_holder.locks.add(self.db.lockstring)
+        self.lock_holder.locks.clear()
+        self.lock_holder.locks.add(self.db.lockstring)
+        self.ndb.spawn_lockstring = None
 
     @property
     def respawn_rate(self):
@@ -330,6 +890,23 @@ class Spawner(Script):
             new_respawn = datetime.now() + timedelta(seconds=value)
             if new_respawn < self.db.respawn_at:
                 self.db.respawn_at = new_respawn
+        SPAWNER_ENGINE.reschedule(self)
+
+    @property
+    def population(self):
+        """
+        How many spawned objects the spawner keeps in its location.
+        """
+        if self.db.population is None:
+            return 1
+        return self.db.population
+
+    @property
+    def respawn_jitter(self):
+        """
+        Up to how many seconds are randomly added to each respawn.
+        """
+        return self.db.respawn_jitter or 0
 
     @staticmethod
     def get_key(obj_name):
@@ -344,11 +921,31 @@ class Spawner(Script):
 
         # If this isn't set here, then it's set when self.db.spawn_type is set
         if self.db.spawn_type:
-            self.ndb.spawn_class = class_from_module(self.db.spawn_type)
+            self.ndb.spawn_class = spawn_class(self.db.spawn_type)
+
+        # Spawners used to tick on their own, but now the engine decides when they need to do anything. Evennia
+        # starts the old ticker right after this hook, so it has to be stopped once that's done.
+        if self.interval:
+            reactor.callLater(0, self.stop_ticking)
+        SPAWNER_REGISTRY.add(self)
+        SPAWNER_ENGINE.register(self)
+
+    def stop_ticking(self):
+        """
+        Restart a spawner from before the engine without an interval, which stops its old ticker for good.
+        """
+        if self.interval:
+            self.restart(interval=0)
 
-        self.ndb.lock_holder = Spawner.LockHolder(self.db.lockstring)
+    def at_stop(self):
+        SPAWNER_ENGINE.drain_pool(self)
+        SPAWNER_ENGINE.unregister(self)
+        SPAWNER_REGISTRY.remove(self)
 
     def find_target(self):
+        """
+        Look for the target by name. Only used for spawners that don't have a record of what they spawned.
+        """
         room_contents = self.obj.contents_get()
 
         for obj in room_contents:
@@ -373,35 +970,91 @@ class Spawner(Script):
         return respawn_indicator
 
     def spawn_target(self):
-        spawned = create_object(typeclass=self.db.spawn_type,
-                                key=self.db.spawn_name,
-                                location=self.obj,
-                                home=self.obj,
-                                aliases=self.db.aliases,
-                                locks=self.db.lockstring)
+        return self.spawn_targets(1)[0]
 
-        # Set attributes on the new object
-        for attr, value in self.db.attributes.items():
-            setattr(spawned.db, attr, value)
+    def spawn_targets(self, count):
+        """
+        Spawn several objects at once.
+
+        Args:
+            count (int): Number of objects to spawn.
 
-        # Copy locks from the lock holder
-        spawned.locks.add(str(self.ndb.lock_holder.locks))
+        Returns:
+            spawned (list): The spawned objects.
+        """
+        template = self.template
+        aliases = self.db.aliases
+        if template:
+            aliases = template.aliases + [alias for alias in aliases if alias not in template.aliases]
+        lockstring = self.spawn_lockstring
+
+        spawned = []
+        # Create the objects, their attributes and their locks all at once
+        with transaction.atomic():
+            for _ in range(count):
+                # The spawner's own Attributes override the prototype's
+                attributes = template.spawn_attributes() if template else {}
+                attributes.update(self.db.attributes)
+                # Lets the spawned object tell us when it's gone
+                attributes["spawner"] = self
+
+                obj = SPAWNER_ENGINE.unpark(self) if self.db.pooled else None
+                if obj:
+                    self.reset_spawned(obj, attributes, aliases, lockstring)
+                    self.ndb.pool_hits = (self.ndb.pool_hits or 0) + 1
+                else:
+                    obj = create_object(typeclass=self.db.spawn_type,
+                                        key=self.db.spawn_name,
+                                        location=self.obj,
+                                        home=self.obj,
+                                        aliases=aliases,
+                                        locks=lockstring)
+                    add_attributes(obj, attributes)
+                    self.ndb.fresh_spawns = (self.ndb.fresh_spawns or 0) + 1
+                    # Creating an object in place doesn't go through the room's arrival hook, which keeps the room's
+                    # idle objects, talkers and appearance up to date
+                    self.obj.at_object_receive(obj, None)
+                if template:
+                    template.apply_extras(obj)
+                spawned.append(obj)
 
         self.db.respawn_at = None
+        SPAWNER_ENGINE.add_instances(self, spawned)
 
         return spawned
 
-    def at_repeat(self):
-        if self.find_target():
-            self.db.respawn_at = None
-        else:
-            if self.respawn_rate == 0:
-                self.spawn_target()
-            elif self.db.respawn_at:
-                if datetime.now() >= self.db.respawn_at:
-                    self.spawn_target()
-            else:
-                self.db.respawn_at = datetime.now() + timedelta(seconds=self.respawn_rate)
+    def reset_spawned(self, spawned, attributes, aliases, lockstring):
+        """
+        Make a parked object look like it was freshly spawned and put it back in our location.
+
+        Args:
+            spawned (Object): Object taken from the pool.
+            attributes (dict): Attribute values the object should end up with.
+            aliases (list): Aliases the object should end up with.
+            lockstring (str): Locks the object should end up with.
+        """
+        spawned.key = self.db.spawn_name
+        spawned.home = self.obj
+        spawned.aliases.clear()
+        spawned.aliases.add(aliases)
+        spawned.tags.clear()
+        spawned.attributes.clear()
+        spawned.nattributes.clear()
+        spawned.locks.clear()
+
+        # Same set-up a new object gets
+        spawned.basetype_setup()
+        spawned.at_object_creation()
+        spawned.locks.add(lockstring)
+        add_attributes(spawned, attributes)
+
+        spawned.move_to(self.obj, quiet=True)
+
+    def pool_status(self):
+        if not self.db.pooled:
+            return "off"
+        return "on ({} parked, {} reused / {} created since reload)".format(
+            len(SPAWNER_ENGINE.pool_for(self)), self.ndb.pool_hits or 0, self.ndb.fresh_spawns or 0)
 
     def is_valid(self):
         return (super(Spawner, self).is_valid() and (self.ndb.spawn_class or not self.is_active) and
@@ -0,0 +1,42 @@
+"""
+Tests for systems that don't need a game world. Run with "evennia test systems".
+
+"""
+from unittest import TestCase
+from systems.prototypes import compile_templates, flatten
+
+
+OBJECT_TYPECLASS = "typeclasses.objects.Object"
+
+
+class TestPrototypes(TestCase):
+    def setUp(self):
+        self.prototypes = {
+            "ROCK": {"key": "rock", "typeclass": OBJECT_TYPECLASS, "desc": "A rock.", "weight": 5},
+            "BOULDER": {"prototype": "ROCK", "key": "boulder", "weight": 500},
+            "MOSSY_BOULDER": {"prototype": ["BOULDER"], "desc": "A mossy boulder."},
+        }
+
+    def test_flatten_without_parent(self):
+        flattened = {}
+        self.assertEqual(flatten("ROCK", self.prototypes, flattened), self.prototypes["ROCK"])
+
+    def test_flatten_with_parents(self):
+        prototype = flatten("MOSSY_BOULDER", self.prototypes, {})
+        self.assertEqual(prototype, {"key": "boulder", "typeclass": OBJECT_TYPECLASS, "desc": "A mossy boulder.",
+                                     "weight": 500})
+
+    def test_flatten_loop(self):
+        self.prototypes["ROCK"]["prototype"] = "MOSSY_BOULDER"
+        with self.assertRaises(ValueError):
+            flatten("ROCK", self.prototypes, {})
+
+    def test_flatten_missing_parent(self):
+        with self.assertRaises(ValueError):
+            flatten("PEBBLE", {"PEBBLE": {"prototype": "GRAVEL"}}, {})
+
+    def test_compile_templates(self):
+        templates = compile_templates(self.prototypes)
+        self.assertEqual(sorted(templates), ["BOULDER", "MOSSY_BOULDER", "ROCK"])
+        self.assertEqual(templates["ROCK"].attributes, {"desc": "A rock.", "weight": 5})
+        self.assertEqual(templates["MOSSY_BOULDER"].typeclass, OBJECT_TYPECLASS)
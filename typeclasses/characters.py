@@ -7,10 +7,12 @@ is setup to be the "default" character type created by the default
 creation commands.
 
 """
+from django.db import transaction
 from evennia import DefaultCharacter
-from systems.idle import IdleScript
+from systems.idle import IDLE_SCHEDULER, IdleScript
+from systems.quests import QUEST_EVENTS, QUEST_LOCKS, QuestAdvanced, QuestCleared, QuestCompleted, QuestStarted
 from typeclasses.objects import SharedObject
-from utils.constants import QUEST_COMPLETE
+from utils.constants import QUEST_COMPLETE, TAG_CATEGORY_QUEST_STAGE
 
 
 class SharedCharacter(SharedObject, DefaultCharacter):
@@ -61,41 +63,133 @@ class Character(SharedCharacter):
         """
         Make sure that we have all required fields to support all actions.
 
-        Add any scripts we need.
+        Clean up any scripts left over from older versions.
         """
-        if not self.db.quests:
-            self.db.quests = {}
+        self.migrate_quest_attribute()
 
-        # We shouldn't have an idle script attached yet, but just in case we don't want to have more than one
-        if not self.scripts.get(IdleScript.get_key(self)):
-            self.scripts.add(IdleScript)
+        # Idle messages used to come from a script on each character
+        if self.scripts.get(IdleScript.get_key(self)):
+            self.scripts.delete(IdleScript.get_key(self))
 
         super(Character, self).at_pre_puppet(*args, **kwargs)
 
-    def at_post_unpuppet(self, *args, **kwargs):
+    def at_post_puppet(self, *args, **kwargs):
         """
-        Make sure that we have all required fields to support all actions.
+        Start showing idle messages now that we're online.
+        """
+        super(Character, self).at_post_puppet(*args, **kwargs)
 
-        Remove any scripts we don't want running when not online.
+        IDLE_SCHEDULER.add_viewer(self)
+
+    def at_post_unpuppet(self, *args, **kwargs):
         """
-        self.scripts.delete(IdleScript.get_key(self))
+        Stop anything we don't want running when not online.
+        """
+        IDLE_SCHEDULER.remove_viewer(self)
+        # The default unpuppet takes us off the grid without calling any leave hook
+        if self.location and hasattr(self.location, "appearance_changed"):
+            self.location.appearance_changed()
 
         super(Character, self).at_post_unpuppet(*args, **kwargs)
 
+    def quests(self):
+        """
+        Get quest progress, read from the character's quest stage tags the first time it's needed and then kept in
+        sync as quests change.
+
+        Returns:
+            quests (dict): Stage by quest name for every quest the character has started.
+        """
+        quests = self.ndb.quests
+        if quests is None:
+            quests = {}
+            prefix = TAG_CATEGORY_QUEST_STAGE.format("")
+            for quest_name, category in self.tags.all(return_key_and_category=True):
+                if category and category.startswith(prefix):
+                    quests[quest_name] = int(category[len(prefix):])
+            self.ndb.quests = quests
+        return quests
+
     def quest_status(self, quest_name):
         """
         Check what stage of a quest the character is on
         """
-        return self.db.quests.get(quest_name, None)
+        return self.quests().get(quest_name, None)
 
-    def quest_advance(self, quest_name, stage):
+    def quest_advance(self, quest_name, stage, publish=True):
         """
         Set what stage of a quest the character is on
+
+        Args:
+            quest_name (str): Quest to set.
+            stage (int): Stage to set it to.
+            publish (bool): Whether to publish the change to quest hooks and other subscribers.
+        """
+        old_stage = self.quest_status(quest_name)
+        if old_stage == stage:
+            return
+        self.store_quest_stage(quest_name, stage)
+        if not publish:
+            return
+
+        if stage == QUEST_COMPLETE:
+            event_type = QuestCompleted
+        elif old_stage is None:
+            event_type = QuestStarted
+        else:
+            event_type = QuestAdvanced
+        QUEST_EVENTS.publish(event_type(self, quest_name, old_stage, stage))
+
+    def store_quest_stage(self, quest_name, stage):
+        """
+        Save a quest stage without telling anyone about it.
         """
-        self.db.quests[quest_name] = stage
+        quests = self.quests()
+        old_stage = quests.get(quest_name)
+        with transaction.atomic():
+            if old_stage is not None:
+                self.tags.remove(quest_name, category=TAG_CATEGORY_QUEST_STAGE.format(old_stage))
+            self.tags.add(quest_name, category=TAG_CATEGORY_QUEST_STAGE.format(stage))
+        quests[quest_name] = stage
+        QUEST_LOCKS.forget(self)
 
     def quest_complete(self, quest_name):
         """
         Mark a quest as completed.
         """
-        self.db.quests[quest_name] = QUEST_COMPLETE
+        self.quest_advance(quest_name, QUEST_COMPLETE)
+
+    def quest_clear(self, quest_name, publish=True):
+        """
+        Forget all progress on a quest.
+
+        Args:
+            quest_name (str): Quest to clear.
+            publish (bool): Whether to publish the change to quest hooks and other subscribers.
+
+        Returns:
+            cleared (bool): Whether there was any progress to clear.
+        """
+        quests = self.quests()
+        if quest_name not in quests:
+            return False
+
+        old_stage = quests.pop(quest_name)
+        self.tags.remove(quest_name, category=TAG_CATEGORY_QUEST_STAGE.format(old_stage))
+        QUEST_LOCKS.forget(self)
+        if publish:
+            QUEST_EVENTS.publish(QuestCleared(self, quest_name, old_stage, None))
+        return True
+
+    def migrate_quest_attribute(self):
+        """
+        Quest progress used to be kept in a single "quests" Attribute. Move it over to tags if it's still there.
+        """
+        legacy_quests = self.attributes.get("quests")
+        if legacy_quests is None:
+            return
+
+        with transaction.atomic():
+            for quest_name, stage in legacy_quests.items():
+                self.store_quest_stage(quest_name, stage)
+            self.attributes.remove("quests")
@@ -43,6 +43,6 @@ class Exit(SharedObject, DefaultExit):
         Args:
             looker (Object): Object doing the looking.
         """
-        if not self.db.desc:
+        if not self.get_display_appearance(looker):
             return looker.at_look(self.destination)
         return super(Exit, self).return_appearance(looker)
@@ -8,5 +8,5 @@ class NPC(SharedCharacter):
             quest_status = looker.quest_status(self.db.quest)
             if quest_status is not None:
                 # If we have quest-state specific description, display it instead
-                desc = getattr(self.db, "desc_quest_{}".format(quest_status), None)
+                desc = self.quest_descs().get(quest_status)
         return desc
@@ -11,6 +11,194 @@ inheritance.
 
 """
 from evennia import DefaultObject
+from evennia.typeclasses.attributes import AttributeHandler
+from evennia.utils.utils import lazy_property, make_iter
+from itertools import chain
+from systems.dialogue import TALKERS
+from systems.idle import IDLE_SCHEDULER, IDLE_SOURCES
+from systems.spawner import SPAWNER_ENGINE
+from utils.lock_cache import SIGNATURE_LOCK_FUNCS, InternedLockHandler, visible_subsets
+
+
+# Attributes named this followed by a quest stage hold the description for viewers at that stage of the object's quest
+QUEST_DESC_PREFIX = "desc_quest_"
+# Attributes other than quest descriptions that change how an object looks
+APPEARANCE_ATTRIBUTES = ("desc", "quest")
+
+
+class SharedAttributeHandler(AttributeHandler):
+    """
+    AttributeHandler that keeps what's built from the owner's Attributes (quest descriptions, cached appearance, and
+    its room's indexes of idle and talkative objects) in sync when they change.
+    """
+    def add(self, key, *args, **kwargs):
+        result = super(SharedAttributeHandler, self).add(key, *args, **kwargs)
+        self.changed(key)
+        return result
+
+    def batch_add(self, *args, **kwargs):
+        result = super(SharedAttributeHandler, self).batch_add(*args, **kwargs)
+        self.changed_all()
+        return result
+
+    def remove(self, key, *args, **kwargs):
+        result = super(SharedAttributeHandler, self).remove(key, *args, **kwargs)
+        self.changed(*make_iter(key))
+        return result
+
+    def clear(self, *args, **kwargs):
+        result = super(SharedAttributeHandler, self).clear(*args, **kwargs)
+        self.changed_all()
+        return result
+
+    def changed(self, *keys):
+        """
+        Called after Attributes are added or removed, including ones linked without going through the handler.
+        """
+        keys = [str(key) for key in keys]
+        if any(key.startswith(QUEST_DESC_PREFIX) for key in keys):
+            self.obj.ndb.quest_descs = None
+            self.obj.appearance_changed()
+        elif any(key in APPEARANCE_ATTRIBUTES for key in keys):
+            self.obj.appearance_changed()
+        if IDLE_SOURCES.attribute in keys:
+            IDLE_SCHEDULER.lines_changed(self.obj)
+        if TALKERS.attribute in keys:
+            TALKERS.changed(self.obj)
+
+    def changed_all(self):
+        self.obj.ndb.quest_descs = None
+        self.obj.appearance_changed()
+        IDLE_SCHEDULER.lines_changed(self.obj)
+        TALKERS.changed(self.obj)
+
+
+class SharedLockHandler(InternedLockHandler):
+    """
+    InternedLockHandler that tells the owner's location when its locks change, since they decide who can see it there.
+    """
+    def add(self, *args, **kwargs):
+        result = super(SharedLockHandler, self).add(*args, **kwargs)
+        self.changed()
+        return result
+
+    def remove(self, *args, **kwargs):
+        result = super(SharedLockHandler, self).remove(*args, **kwargs)
+        self.changed()
+        return result
+    delete = remove
+
+    def clear(self, *args, **kwargs):
+        result = super(SharedLockHandler, self).clear(*args, **kwargs)
+        self.changed()
+        return result
+
+    def changed(self):
+        location = self.obj.location
+        if location and hasattr(location, "appearance_changed"):
+            location.appearance_changed()
+
+
+def visibility_signature(looker, quests):
+    """
+    Everything about a viewer that the locks in SIGNATURE_LOCK_FUNCS can look at, so viewers with the same signature
+    see the same things.
+
+    Args:
+        looker (Object): Object doing the looking.
+        quests (tuple): Quests whose stage matters.
+
+    Returns:
+        signature (tuple): Hashable summary of the viewer.
+    """
+    player = getattr(looker, "player", None)
+    stages = tuple(looker.quest_status(quest) for quest in quests) if hasattr(looker, "quest_status") else ()
+    return (looker.is_superuser,
+            tuple(sorted(looker.permissions.all())),
+            tuple(sorted(player.permissions.all())) if player else (),
+            bool(player and player.attributes.get("_quell")),
+            stages)
+
+
+class AppearanceRender(object):
+    """
+    What return_appearance shows one viewer, kept apart enough that the viewer can be left out of the contents later.
+    """
+    def __init__(self, obj, looker):
+        self.key = obj.key
+        self.header = "|c%s|n\n" % obj.get_display_name(looker)
+        self.desc = obj.get_display_appearance(looker)
+        # (object, key when rendered, whether it had a player, display name) for each visible content
+        self.exits, self.users, self.things = [], [], []
+        for con in obj.visible_contents(looker)[1]:
+            name = con.get_display_name(looker)
+            has_player = con.has_player
+            if con.destination:
+                self.exits.append((con, con.key, has_player, name))
+            elif has_player:
+                self.users.append((con, con.key, has_player, "|c%s|n" % name))
+            else:
+                self.things.append((con, con.key, has_player, name))
+
+    def is_current(self, obj):
+        """
+        Returns:
+            current (bool): False if anything shown has been renamed or connected or disconnected since, neither of
+                which goes through any hook.
+        """
+        return obj.key == self.key and all(con.key == key and con.has_player == has_player
+                                           for con, key, has_player, _ in chain(self.exits, self.users, self.things))
+
+    def text(self, looker):
+        exits = [name for con, _, _, name in self.exits if con != looker]
+        seen = [name for con, _, _, name in chain(self.users, self.things) if con != looker]
+        string = self.header
+        if self.desc:
+            string += "%s" % self.desc
+        if exits:
+            string += "\n|wExits:|n " + ", ".join(exits)
+        if seen:
+            string += "\n|wYou see:|n " + ", ".join(seen)
+        return string
+
+
+class AppearanceCache(object):
+    """
+    A room's rendered appearance for each kind of viewer, good until the room's appearance version changes.
+    """
+    def __init__(self, room, version):
+        self.version = version
+        self.renders = {}
+
+        # Work out which quests the room's look depends on, and whether any lock depends on more than that
+        quests = set()
+        self.cacheable = True
+        if room.db.quest:
+            quests.add(room.db.quest)
+        for con in room.contents:
+            for access_type in ("view", "notice"):
+                lockdef = con.locks.locks.get(access_type)
+                if not lockdef:
+                    continue
+                for func, args, _ in lockdef[1]:
+                    if func.__name__ not in SIGNATURE_LOCK_FUNCS:
+                        self.cacheable = False
+                    elif func.__name__ == "quest" and args:
+                        quests.add(args[0])
+        self.quests = tuple(sorted(quests))
+
+    def render(self, room, looker):
+        """
+        Returns:
+            render (AppearanceRender): What the room looks like to the looker.
+        """
+        if not self.cacheable:
+            return AppearanceRender(room, looker)
+        signature = visibility_signature(looker, self.quests)
+        render = self.renders.get(signature)
+        if render is None or not render.is_current(room):
+            render = self.renders[signature] = AppearanceRender(room, looker)
+        return render
 
 
 class SharedObject(DefaultObject):
@@ -18,6 +206,76 @@ class SharedObject(DefaultObject):
     Defines functions that should be shared across Characters, Exits, Objects, and Rooms.
     Used as a mix-in or directly inherited from for all of those classes.
     """
+    @lazy_property
+    def locks(self):
+        # Share parsed locks with every other object that has the same lockstring
+        return SharedLockHandler(self)
+
+    @lazy_property
+    def attributes(self):
+        # Keeps quest descriptions in sync when they're edited
+        return SharedAttributeHandler(self)
+
+    def at_object_delete(self):
+        """
+        Called just before the object is deleted. Returning False aborts the deletion.
+        """
+        spawner = self.db.spawner
+        if spawner and SPAWNER_ENGINE.park(spawner, self):
+            # Pooled spawners keep what they spawned around to reuse it
+            return False
+
+        IDLE_SCHEDULER.object_deleted(self)
+        if self.location:
+            TALKERS.left(self.location, self)
+            if hasattr(self.location, "appearance_changed"):
+                self.location.appearance_changed()
+        if spawner:
+            SPAWNER_ENGINE.target_removed(spawner, self, deleted=True)
+        return super(SharedObject, self).at_object_delete()
+
+    def at_after_move(self, source_location, *args, **kwargs):
+        """
+        Called after every successful move, including being picked up.
+        """
+        super(SharedObject, self).at_after_move(source_location, *args, **kwargs)
+
+        # Let our spawner know we've left so it can respawn us
+        spawner = self.db.spawner
+        if spawner and source_location == spawner.obj and self.location != spawner.obj:
+            SPAWNER_ENGINE.target_removed(spawner, self)
+
+    def quest_descs(self):
+        """
+        Get the object's quest-stage-specific descriptions, read from its desc_quest_<stage> Attributes the first time
+        they're needed and kept until one of them changes.
+
+        Returns:
+            descs (dict): Description by quest stage.
+        """
+        descs = self.ndb.quest_descs
+        if descs is None:
+            descs = {}
+            for attr in self.attributes.all():
+                if attr.key.startswith(QUEST_DESC_PREFIX):
+                    try:
+                        descs[int(attr.key[len(QUEST_DESC_PREFIX):])] = attr.value
+                    except ValueError:
+                        continue
+            self.ndb.quest_descs = descs
+        return descs
+
+    def quest_stage_of(self, looker):
+        """
+        Returns:
+            stage (int): What stage the looker is at in this object's quest, or None if it has no quest or the looker
+                hasn't started it.
+        """
+        quest = self.db.quest
+        if not quest or not hasattr(looker, "quest_status"):
+            return None
+        return looker.quest_status(quest)
+
     def get_display_appearance(self, looker):
         """
         Gets the current description of the object. Can be overridden for custom appearance based on
@@ -26,42 +284,57 @@ class SharedObject(DefaultObject):
         Args:
             looker (Object): Object doing the looking.
         """
+        # If we have quest-state specific description, display it instead
+        quest_stage = self.quest_stage_of(looker)
+        if quest_stage is not None:
+            descs = self.quest_descs()
+            if quest_stage in descs:
+                return descs[quest_stage]
         return self.db.desc
 
+    def visible_contents(self, looker, objs=None, notice_type="notice"):
+        """
+        Check which of our contents the looker can see, in one batch.
+
+        Args:
+            looker (Object): Object doing the looking.
+            objs (iterable): Objects to check, or None to check all of our contents.
+            notice_type (str): Access type, passing by default, that something visible also needs to be noticed.
+
+        Returns:
+            visible (list): Objects the looker can view.
+            noticed (list): Visible objects that also pass their notice_type lock.
+        """
+        return visible_subsets(looker, self.contents if objs is None else objs, notice_type)
+
+    def appearance_changed(self):
+        """
+        Called when something that return_appearance shows has changed, so cached renders are thrown away.
+        """
+        self.ndb.appearance_version = (self.ndb.appearance_version or 0) + 1
+
     # OVERRIDE: March 2017, evennia.objects.objects.Object.return_appearance
     def return_appearance(self, looker):
         """
         This formats a description. It is the hook a 'look' command
         should call. Note that any changes to evennia's base return_appearance function will need to be reflected here
 
+        Rooms keep what they render for each visibility signature until their appearance version changes.
+
         Args:
             looker (Object): Object doing the looking.
         """
         if not looker:
             return ""
-        # get and identify all objects
-        visible = (con for con in self.contents if con != looker
-                   and con.access(looker, "view")
-                   and con.access(looker, "notice", default=True))
-        exits, users, things = [], [], []
-        for con in visible:
-            key = con.get_display_name(looker)
-            if con.destination:
-                exits.append(key)
-            elif con.has_player:
-                users.append("|c%s|n" % key)
-            else:
-                things.append(key)
-        # get description, build string
-        string = "|c%s|n\n" % self.get_display_name(looker)
-        desc = self.get_display_appearance(looker)
-        if desc:
-            string += "%s" % desc
-        if exits:
-            string += "\n|wExits:|n " + ", ".join(exits)
-        if users or things:
-            string += "\n|wYou see:|n " + ", ".join(users + things)
-        return string
+        if self.location:
+            # Only rooms are looked at often enough to be worth caching
+            return AppearanceRender(self, looker).text(looker)
+
+        version = self.ndb.appearance_version or 0
+        cache = self.ndb.appearance_cache
+        if cache is None or cache.version != version:
+            cache = self.ndb.appearance_cache = AppearanceCache(self, version)
+        return cache.render(self, looker).text(looker)
 
 
 class Object(SharedObject):
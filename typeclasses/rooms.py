@@ -6,6 +6,8 @@ Rooms are simple containers that has no location of their own.
 """
 
 from evennia import DefaultRoom
+from systems.dialogue import TALKERS
+from systems.idle import IDLE_SCHEDULER
 from typeclasses.objects import SharedObject
 
 
@@ -19,4 +21,22 @@ class Room(SharedObject, DefaultRoom):
     See examples/object.py for a list of
     properties and methods available on all Objects.
     """
-    pass
+    def at_object_receive(self, moved_obj, source_location, *args, **kwargs):
+        """
+        Keep idle messages, who can be talked to, and how the room looks in sync with who and what is in the room.
+        """
+        super(Room, self).at_object_receive(moved_obj, source_location, *args, **kwargs)
+
+        IDLE_SCHEDULER.object_arrived(self, moved_obj)
+        TALKERS.arrived(self, moved_obj)
+        self.appearance_changed()
+
+    def at_object_leave(self, moved_obj, target_location, *args, **kwargs):
+        """
+        Keep idle messages, who can be talked to, and how the room looks in sync with who and what is in the room.
+        """
+        super(Room, self).at_object_leave(moved_obj, target_location, *args, **kwargs)
+
+        IDLE_SCHEDULER.object_left(self, moved_obj)
+        TALKERS.left(self, moved_obj)
+        self.appearance_changed()
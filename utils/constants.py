@@ -6,6 +6,15 @@ QUEST_DESC_CONST = 'QUEST_DESC'
 IDLE_INTERVAL = 5.0
 
 RESPAWN_RATE_DEFAULT = 300
-RESPAWN_TICK_RATE = 5
+# Seconds per tick of the spawner engine's timing wheel
+RESPAWN_RESOLUTION = 1.0
+# Spawners first check on their target at a random point this many seconds after starting, so a reload doesn't
+# check them all at once
+RESPAWN_START_SPREAD = 5
+# Spawners that fail to respawn try again after twice as many seconds each time, up to this many
+RESPAWN_RETRY_MAX = 60
 
 TAG_CATEGORY_BUILDING = "building"
+# Quest progress is stored as a tag keyed by quest name in the category for its stage, so characters can be looked up
+# by quest and stage
+TAG_CATEGORY_QUEST_STAGE = "quest_stage_{}"
@@ -0,0 +1,399 @@
+"""
+Dialogue converter
+
+Converts a Python talk file into a JSON talk file (see systems/dialogue_data.py) by reading its source, so it doesn't
+need the game running. Each node function is stepped through once for every quest stage it checks, and stages that
+end up showing the same thing are grouped into one variant.
+
+Nodes can assign text and option lists, append or insert options, use option dicts defined at the top of the file,
+check the quest stage from caller.quest_status(), call caller.quest_advance() and caller.quest_complete(), and fill
+in text with "...".format(caller.name). Anything else is left out and reported, so check those nodes by hand.
+
+Usage:
+    python -m utils.convert_dialogue world/npcs/tutorial.py [world/npcs/tutorial.json]
+
+"""
+from __future__ import print_function
+import ast
+import json
+import string
+import sys
+
+
+QUEST_MODULE_PREFIX = "world.quests."
+# Stands in for every quest stage a node doesn't check for by name
+OTHER_STAGE = object()
+
+
+class Unsupported(Exception):
+    """
+    Raised for code the converter doesn't understand.
+    """
+    def __init__(self, node, what):
+        super(Unsupported, self).__init__("line {}: {}".format(getattr(node, "lineno", "?"), what))
+
+
+class SharedOption(object):
+    """
+    Reference to an option dict defined at the top of the talk file.
+    """
+    def __init__(self, name):
+        self.name = name
+
+
+class Text(object):
+    """
+    Text that may have caller fields to fill in when shown.
+    """
+    def __init__(self, text, formatted=False):
+        self.text = text
+        self.formatted = formatted
+
+    def __add__(self, other):
+        return Text(self.escaped(self.formatted or other.formatted) + other.escaped(self.formatted or other.formatted),
+                    self.formatted or other.formatted)
+
+    def escaped(self, formatted):
+        if formatted and not self.formatted:
+            return self.text.replace("{", "{{").replace("}", "}}")
+        return self.text
+
+
+def literal(node):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise Unsupported(node, "expected a literal value")
+
+
+def arg_name(arg):
+    # Python 3 wraps arguments in ast.arg, Python 2 uses ast.Name
+    return getattr(arg, "arg", None) or arg.id
+
+
+class Converter(object):
+    def __init__(self, source):
+        self.tree = ast.parse(source)
+        # Name in the talk file -> quest internal name, from "from world.quests.<quest> import INTERNAL_NAME"
+        self.quest_names = {}
+        # Name -> option dict
+        self.shared_options = {}
+        self.functions = []
+        self.quests = set()
+        self.warnings = []
+
+        for node in self.tree.body:
+            if isinstance(node, ast.ImportFrom) and (node.module or "").startswith(QUEST_MODULE_PREFIX):
+                for alias in node.names:
+                    if alias.name == "INTERNAL_NAME":
+                        self.quest_names[alias.asname or alias.name] = node.module[len(QUEST_MODULE_PREFIX):]
+            elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                try:
+                    value = ast.literal_eval(node.value)
+                except ValueError:
+                    continue
+                if isinstance(value, dict):
+                    self.shared_options[node.targets[0].id] = value
+            elif isinstance(node, ast.FunctionDef) and not node.name.startswith("_"):
+                self.functions.append(node)
+
+    def convert(self):
+        """
+        Returns:
+            data (dict): The talk file as JSON-ready data.
+        """
+        nodes = {}
+        for function in self.functions:
+            nodes[function.name] = self.convert_node(function)
+
+        quest = None
+        if len(self.quests) == 1:
+            quest = next(iter(self.quests))
+        elif self.quests:
+            self.warnings.append("talk file uses several quests ({}); stage variants assume {}".format(
+                ", ".join(sorted(self.quests)), sorted(self.quests)[0]))
+            quest = sorted(self.quests)[0]
+        for node in nodes.values():
+            for variant in node.get("variants", [node]):
+                for action in variant.get("actions", []):
+                    if action.get("quest") == quest:
+                        del action["quest"]
+
+        data = {}
+        if quest:
+            data["quest"] = quest
+        if self.shared_options:
+            data["options"] = self.shared_options
+        data["nodes"] = nodes
+        return data
+
+    def convert_node(self, function):
+        caller = arg_name(function.args.args[0]) if function.args.args else "caller"
+        stages = self.stages_checked(function)
+
+        results = []
+        for stage in stages:
+            try:
+                results.append((stage, self.run(function, caller, stage)))
+            except Unsupported as err:
+                self.warnings.append("{}: {}".format(function.name, err))
+                results.append((stage, {"text": ""}))
+
+        formatted = any(result.pop("formatted", False) for _, result in results)
+        for _, result in results:
+            if "text" in result:
+                result["text"] = result["text"].escaped(formatted) if isinstance(result["text"], Text) else ""
+
+        default = results[-1][1]
+        variants = []
+        for stage, result in results[:-1]:
+            if result == default:
+                continue
+            for variant in variants:
+                if {key: value for key, value in variant.items() if key != "stage"} == result:
+                    variant["stage"].append(stage)
+                    break
+            else:
+                variant = {"stage": [stage]}
+                variant.update(result)
+                variants.append(variant)
+
+        node = {}
+        if variants:
+            node["variants"] = variants + [default]
+        else:
+            node.update(default)
+        if formatted:
+            node["format"] = True
+        return node
+
+    def stages_checked(self, function):
+        """
+        Returns:
+            stages (list): Every quest stage the node treats specially, then OTHER_STAGE. Just OTHER_STAGE if the node
+                doesn't check the quest stage.
+        """
+        status_names = set()
+        for node in ast.walk(function):
+            if isinstance(node, ast.Assign) and self.is_caller_call(node.value, "quest_status"):
+                status_names.update(target.id for target in node.targets if isinstance(target, ast.Name))
+                self.quests.add(self.quest_of(node.value.args[0]))
+        if not status_names:
+            return [OTHER_STAGE]
+
+        # Not started and completed always behave differently from other stages when checked for truth
+        stages = set([None, 0])
+        for node in ast.walk(function):
+            if isinstance(node, ast.Compare) and isinstance(node.left, ast.Name) and node.left.id in status_names:
+                for comparator in node.comparators:
+                    try:
+                        value = ast.literal_eval(comparator)
+                    except ValueError:
+                        continue
+                    for stage in (value if isinstance(value, (list, tuple, set)) else [value]):
+                        if stage is None or isinstance(stage, int):
+                            stages.add(stage)
+        return sorted(stages, key=lambda stage: -1 if stage is None else stage) + [OTHER_STAGE]
+
+    def is_caller_call(self, node, method):
+        return (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == method and
+                isinstance(node.func.value, ast.Name))
+
+    def quest_of(self, node):
+        if isinstance(node, ast.Name) and node.id in self.quest_names:
+            return self.quest_names[node.id]
+        quest = literal(node)
+        if not isinstance(quest, str):
+            raise Unsupported(node, "expected a quest name")
+        return quest
+
+    def run(self, function, caller, stage):
+        """
+        Step through a node at one quest stage.
+
+        Returns:
+            result (dict): Text, options and actions the node shows and does at that stage.
+        """
+        env = {}
+        actions = []
+        result = self.run_block(function.body, caller, stage, env, actions)
+        if result is None:
+            raise Unsupported(function, "node doesn't return anything")
+
+        text, options = result
+        converted = {"text": text, "formatted": text.formatted}
+        if options:
+            converted["options"] = [option.name if isinstance(option, SharedOption) else option for option in options]
+        if actions:
+            converted["actions"] = actions
+        return converted
+
+    def run_block(self, statements, caller, stage, env, actions):
+        for statement in statements:
+            if isinstance(statement, ast.Return):
+                if not isinstance(statement.value, ast.Tuple) or len(statement.value.elts) != 2:
+                    raise Unsupported(statement, "nodes should return text, options")
+                text = self.evaluate(statement.value.elts[0], caller, env)
+                options = self.evaluate(statement.value.elts[1], caller, env)
+                if not isinstance(text, Text) or not isinstance(options, list):
+                    raise Unsupported(statement, "nodes should return text, options")
+                return text, options
+            elif isinstance(statement, ast.Assign):
+                if len(statement.targets) != 1 or not isinstance(statement.targets[0], ast.Name):
+                    raise Unsupported(statement, "only simple assignments are supported")
+                if self.is_caller_call(statement.value, "quest_status"):
+                    env[statement.targets[0].id] = stage
+                else:
+                    env[statement.targets[0].id] = self.evaluate(statement.value, caller, env)
+            elif isinstance(statement, ast.If):
+                try:
+                    branch = statement.body if self.test(statement.test, env) else statement.orelse
+                except Unsupported as err:
+                    self.warnings.append("{}, took the else branch".format(err))
+                    branch = statement.orelse
+                result = self.run_block(branch, caller, stage, env, actions)
+                if result is not None:
+                    return result
+            elif isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call):
+                self.call(statement.value, caller, env, actions)
+            elif isinstance(statement, ast.Pass):
+                continue
+            else:
+                self.warnings.append("line {}: left out a {} statement".format(
+                    statement.lineno, type(statement).__name__.lower()))
+        return None
+
+    def call(self, node, caller, env, actions):
+        func = node.func
+        if not isinstance(func, ast.Attribute) or not isinstance(func.value, ast.Name):
+            raise Unsupported(node, "unsupported call")
+
+        if func.value.id == caller and func.attr == "quest_advance":
+            quest = self.quest_of(node.args[0])
+            self.quests.add(quest)
+            actions.append({"do": "quest_advance", "quest": quest, "stage": literal(node.args[1])})
+        elif func.value.id == caller and func.attr == "quest_complete":
+            quest = self.quest_of(node.args[0])
+            self.quests.add(quest)
+            actions.append({"do": "quest_complete", "quest": quest})
+        elif isinstance(env.get(func.value.id), list) and func.attr == "append":
+            env[func.value.id] = env[func.value.id] + [self.evaluate(node.args[0], caller, env)]
+        elif isinstance(env.get(func.value.id), list) and func.attr == "insert":
+            options = list(env[func.value.id])
+            options.insert(literal(node.args[0]), self.evaluate(node.args[1], caller, env))
+            env[func.value.id] = options
+        else:
+            raise Unsupported(node, "unsupported call to {}.{}".format(func.value.id, func.attr))
+
+    def test(self, node, env):
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return not self.test(node.operand, env)
+        if isinstance(node, ast.Name) and node.id in env:
+            return bool(self.stage_value(env[node.id], node))
+        if isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.left, ast.Name) and \
+                node.left.id in env:
+            stage = env[node.left.id]
+            op = node.ops[0]
+            value = literal(node.comparators[0])
+            if isinstance(op, (ast.Eq, ast.Is)):
+                return stage is not OTHER_STAGE and stage == value
+            elif isinstance(op, (ast.NotEq, ast.IsNot)):
+                return stage is OTHER_STAGE or stage != value
+            elif isinstance(op, ast.In):
+                return stage is not OTHER_STAGE and stage in value
+            elif isinstance(op, ast.NotIn):
+                return stage is OTHER_STAGE or stage not in value
+        raise Unsupported(node, "unsupported condition")
+
+    @staticmethod
+    def stage_value(stage, node):
+        if stage is OTHER_STAGE:
+            # Any stage not named is an in-progress stage, which is always truthy
+            return True
+        if stage is None or isinstance(stage, int):
+            return stage
+        raise Unsupported(node, "unsupported condition")
+
+    def evaluate(self, node, caller, env):
+        if isinstance(node, ast.Name):
+            if node.id in env:
+                return env[node.id]
+            if node.id in self.shared_options:
+                return SharedOption(node.id)
+            raise Unsupported(node, "unknown name {}".format(node.id))
+        elif isinstance(node, ast.List):
+            return [self.evaluate(element, caller, env) for element in node.elts]
+        elif isinstance(node, ast.Dict):
+            return literal(node)
+        elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            return self.evaluate(node.left, caller, env) + self.evaluate(node.right, caller, env)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "format":
+            return self.format_text(node, caller, env)
+
+        value = literal(node)
+        if not isinstance(value, str):
+            raise Unsupported(node, "unsupported value")
+        return Text(value)
+
+    def format_text(self, node, caller, env):
+        """
+        Turn "...{}...".format(caller.name) into "...{caller.name}..." to be filled in when shown.
+        """
+        template = self.evaluate(node.func.value, caller, env)
+        fields = []
+        for arg in node.args:
+            path = []
+            while isinstance(arg, ast.Attribute):
+                path.insert(0, arg.attr)
+                arg = arg.value
+            if not isinstance(arg, ast.Name) or arg.id != caller or not path:
+                raise Unsupported(arg, "only caller attributes can be formatted into text")
+            fields.append(".".join(["caller"] + path))
+        if node.keywords:
+            raise Unsupported(node, "only positional fields can be formatted into text")
+
+        text = ""
+        auto_index = 0
+        for literal_text, field, spec, conversion in string.Formatter().parse(template.text):
+            text += literal_text.replace("{", "{{").replace("}", "}}")
+            if field is None:
+                continue
+            if field == "":
+                index = auto_index
+                auto_index += 1
+            elif field.isdigit():
+                index = int(field)
+            else:
+                raise Unsupported(node, "only positional fields can be formatted into text")
+            text += "{" + fields[index] + ("!" + conversion if conversion else "") + (":" + spec if spec else "") + "}"
+        return Text(text, formatted=True)
+
+
+def main(argv):
+    if len(argv) not in (2, 3):
+        print(__doc__.strip(), file=sys.stderr)
+        return 1
+
+    with open(argv[1]) as source_file:
+        converter = Converter(source_file.read())
+    data = converter.convert()
+    output = json.dumps(data, indent=4, sort_keys=True, separators=(",", ": "))
+
+    if len(argv) == 3:
+        with open(argv[2], "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    reported = set()
+    for warning in converter.warnings:
+        # Nodes are stepped through once per stage, so the same problem can come up several times
+        if warning in reported:
+            continue
+        reported.add(warning)
+        print("Warning: {}".format(warning), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,214 @@
+"""
+Lock cache
+
+Parsing a lockstring into a LockHandler's lock definitions is relatively slow, and most objects in the game end up
+with one of a handful of lockstrings (spawned objects especially, since a spawner gives every object it spawns the same
+locks). InternedLockHandler keeps one parsed copy of each distinct lockstring and shares it between every handler
+that uses it, only making a private copy when a handler's locks are changed in place.
+
+visible_subsets checks a looker against a whole room's worth of objects at once, using what the parsed locks are made
+of to skip or reuse checks.
+
+"""
+from evennia.locks.lockhandler import LockHandler
+import sys
+import time
+
+
+class LockCache(object):
+    """
+    Parsed lock definitions by normalized lockstring, plus enough bookkeeping to report what sharing them saves.
+    """
+    def __init__(self):
+        # normalized lockstring -> parsed lock definitions
+        self.parsed = {}
+        # normalized lockstring -> approximate size in bytes of its parsed lock definitions
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.parse_time = 0.0
+
+    def __len__(self):
+        return len(self.parsed)
+
+    @staticmethod
+    def normalize(lockstring):
+        """
+        Reduce lockstrings that parse the same to the same key, so "get:all();  edit:perm(Builders)" and
+        "get:all();edit:perm(Builders)" share an entry.
+        """
+        return ";".join(lockdef.strip() for lockdef in lockstring.split(";") if lockdef.strip())
+
+    def get(self, handler, lockstring):
+        """
+        Args:
+            handler (LockHandler): Handler to parse with if the lockstring hasn't been seen before.
+            lockstring (str): Lockstring to look up.
+
+        Returns:
+            locks (dict): Shared lock definitions for the lockstring. Don't modify it.
+        """
+        key = self.normalize(lockstring)
+        locks = self.parsed.get(key)
+        if locks is not None:
+            self.hits += 1
+            return locks
+
+        start = time.time()
+        locks = handler._parse_lockstring(key)
+        self.parse_time += time.time() - start
+        self.misses += 1
+
+        self.parsed[key] = locks
+        self.sizes[key] = deep_size(locks)
+        return locks
+
+    def clear(self):
+        self.__init__()
+
+    def stats(self):
+        """
+        Returns:
+            stats (dict): Number of distinct lockstrings, lookups served from the cache, and estimates of the bytes and
+                seconds those lookups would otherwise have spent parsing their own copies.
+        """
+        average_parse = self.parse_time / self.misses if self.misses else 0.0
+        average_size = float(sum(self.sizes.values())) / len(self.sizes) if self.sizes else 0.0
+        return {
+            "lockstrings": len(self.parsed),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": int(self.hits * average_size),
+            "seconds_saved": self.hits * average_parse,
+        }
+
+
+def deep_size(value):
+    """
+    Approximate the memory used by parsed lock definitions. Lock functions themselves are shared by every handler
+    already, so they aren't counted.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += deep_size(key) + deep_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            if not callable(item):
+                size += deep_size(item)
+    return size
+
+
+LOCK_CACHE = LockCache()
+
+
+class InternedLockHandler(LockHandler):
+    """
+    LockHandler that takes its lock definitions from LOCK_CACHE rather than parsing its own.
+    """
+    def _cache_locks(self, storage_lockstring):
+        self.locks = LOCK_CACHE.get(self, storage_lockstring) if storage_lockstring else {}
+
+    def remove(self, access_type):
+        # The default implementation deletes from self.locks in place, which would change it for everyone sharing it
+        self.locks = dict(self.locks)
+        return super(InternedLockHandler, self).remove(access_type)
+    # The inherited alias would still point at the default implementation
+    delete = remove
+
+
+# Lock functions that always pass
+PASSING_LOCK_FUNCS = ("all", "true")
+# Lock functions that only look at the accessor's permissions and quest stages, which is what a room's appearance
+# cache sorts viewers by
+SIGNATURE_LOCK_FUNCS = PASSING_LOCK_FUNCS + (
+    "false", "none", "superuser", "perm", "perm_above", "pperm", "pperm_above", "quest")
+# Lock functions that only look at the object doing the accessing, so they give the same result whatever they're on
+ACCESSOR_LOCK_FUNCS = SIGNATURE_LOCK_FUNCS + (
+    "id", "dbref", "pid", "pdbref", "attr", "attr_eq", "attr_gt", "attr_ge", "attr_lt", "attr_le", "attr_ne", "tag",
+    "has_player")
+
+LOCK_PASSES = "passes"
+LOCK_ACCESSOR = "accessor"
+LOCK_OBJECT = "object"
+
+# raw lock definition -> LOCK_PASSES, LOCK_ACCESSOR, or LOCK_OBJECT
+LOCK_KINDS = {}
+
+
+def lock_kind(lockdef):
+    """
+    Work out what a parsed lock definition's result depends on. Worked out once per distinct definition.
+
+    Args:
+        lockdef (tuple): (evalstring, lock functions, raw lock definition) as parsed by a LockHandler, or None if the
+            object doesn't have a lock of that type.
+
+    Returns:
+        kind (str): LOCK_PASSES if it always passes, LOCK_ACCESSOR if it only depends on who is accessing, otherwise
+            LOCK_OBJECT.
+    """
+    if not lockdef:
+        # Falls back to the default, which only a superuser can get past
+        return LOCK_ACCESSOR
+    evalstring, funcs, raw = lockdef
+    kind = LOCK_KINDS.get(raw)
+    if kind is None:
+        names = [func.__name__ for func, _, _ in funcs]
+        if "not" not in evalstring.split() and all(name in PASSING_LOCK_FUNCS for name in names):
+            kind = LOCK_PASSES
+        elif all(name in ACCESSOR_LOCK_FUNCS for name in names):
+            kind = LOCK_ACCESSOR
+        else:
+            kind = LOCK_OBJECT
+        LOCK_KINDS[raw] = kind
+    return kind
+
+
+class AccessBatch(object):
+    """
+    Checks one object's access to many others. Locks that always pass aren't checked at all, and locks that only
+    depend on the accessor are checked once for every object that has the same lock.
+    """
+    def __init__(self, accessing_obj):
+        self.accessing_obj = accessing_obj
+        # (access type, raw lock definition, default) -> result
+        self.results = {}
+
+    def check(self, obj, access_type, default=False):
+        lockdef = obj.locks.locks.get(access_type)
+        kind = lock_kind(lockdef)
+        if kind == LOCK_PASSES:
+            return True
+        if kind == LOCK_OBJECT:
+            return obj.access(self.accessing_obj, access_type, default=default)
+
+        key = (access_type, lockdef[2] if lockdef else None, default)
+        result = self.results.get(key)
+        if result is None:
+            result = self.results[key] = obj.access(self.accessing_obj, access_type, default=default)
+        return result
+
+
+def visible_subsets(looker, objs, notice_type="notice"):
+    """
+    Sort out what the looker can see in one pass.
+
+    Args:
+        looker (Object): Object doing the looking.
+        objs (iterable): Objects that might be seen.
+        notice_type (str): Access type, passing by default, that decides whether something seen is noticed.
+
+    Returns:
+        visible (list): Objects passing their view lock, in the order given.
+        noticed (list): Visible objects also passing their notice_type lock.
+    """
+    batch = AccessBatch(looker)
+    visible = []
+    noticed = []
+    for obj in objs:
+        if batch.check(obj, "view"):
+            visible.append(obj)
+            if batch.check(obj, notice_type, default=True):
+                noticed.append(obj)
+    return visible, noticed
@@ -0,0 +1,93 @@
+"""
+Room indexes
+
+Some commands need everything in a room that has a particular Attribute, such as idle lines or a talk file. A
+RoomAttributeIndex keeps a set of those objects on each room, built the first time the room is asked about and then
+kept up to date as objects move and as the Attribute is added or removed, so nothing has to look up the Attribute on
+everything in the room.
+
+"""
+
+
+class RoomAttributeIndex(object):
+    """
+    Objects in each room that have a given Attribute set.
+    """
+    def __init__(self, attribute, include_room=False):
+        """
+        Args:
+            attribute (str): Attribute that puts an object in the index when it's set to anything truthy.
+            include_room (bool): Whether a room with the Attribute is in its own index.
+        """
+        self.attribute = attribute
+        self.include_room = include_room
+        # Name of the non-persistent Attribute each room keeps its set in
+        self.ndb_key = "{}_index".format(attribute)
+
+    def has(self, obj):
+        return bool(obj.attributes.get(self.attribute))
+
+    def get(self, location):
+        """
+        Args:
+            location (Object): Location to get indexed objects for.
+
+        Returns:
+            objs (set): Objects in the location with the Attribute.
+        """
+        objs = location.nattributes.get(self.ndb_key)
+        if objs is None:
+            objs = set(obj for obj in location.contents if self.has(obj))
+            if self.include_room and self.has(location):
+                objs.add(location)
+            # Only rooms keep the set up to date as things move, so don't hold on to it for anything else
+            if location.location is None:
+                location.nattributes.add(self.ndb_key, objs)
+        return objs
+
+    def arrived(self, room, obj):
+        """
+        Called when anything enters a room.
+
+        Returns:
+            changed (bool): Whether the room's set changed.
+        """
+        objs = room.nattributes.get(self.ndb_key)
+        if objs is not None and obj not in objs and self.has(obj):
+            objs.add(obj)
+            return True
+        return False
+
+    def left(self, room, obj):
+        """
+        Called when anything leaves a room, or is deleted from it.
+
+        Returns:
+            changed (bool): Whether the room's set changed.
+        """
+        objs = room.nattributes.get(self.ndb_key)
+        if objs is not None and obj in objs:
+            objs.discard(obj)
+            return True
+        return False
+
+    def changed(self, obj):
+        """
+        Called when the Attribute is added to or removed from an object.
+
+        Returns:
+            room (Object): Room whose set the object belongs in, or None if it isn't in one.
+        """
+        room = obj.location
+        if room is None and self.include_room:
+            # Rooms have no location and may be in their own set
+            room = obj
+        if room is None:
+            return None
+        objs = room.nattributes.get(self.ndb_key)
+        if objs is not None:
+            if self.has(obj):
+                objs.add(obj)
+            else:
+                objs.discard(obj)
+        return room
@@ -0,0 +1,125 @@
+"""
+Timing wheel
+
+A hierarchical timing wheel holds a large number of timers where scheduling, cancelling and firing a timer are all
+constant time, no matter how many timers there are or how far away they are. Time is split into ticks of a fixed
+resolution. The lowest level has a slot for each of the next few ticks, and each level above has slots that each span
+a whole turn of the level below it. As time advances, the slots of higher levels are cascaded down into the lower
+levels until their timers land in the lowest level and fire.
+
+"""
+
+
+class TimingWheel(object):
+    """
+    Holds timers identified by a hashable key. Each key has at most one pending timer; scheduling it again replaces it.
+    """
+    def __init__(self, now, resolution=1.0, slots=64, levels=4):
+        """
+        Args:
+            now (float): Current time, in the same units as all other times passed in.
+            resolution (float): Length of a tick. Timers fire on the first tick at or after their deadline.
+            slots (int): Number of slots on each level.
+            levels (int): Number of levels. Timers further away than slots ** levels ticks wait in an overflow bucket.
+        """
+        self.resolution = resolution
+        self.slots = slots
+        self.spans = [slots ** level for level in range(levels)]
+        self.levels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow = {}
+        # Timers that were already due when scheduled fire on the next advance
+        self.ready = {}
+        self.current_tick = self.to_tick(now)
+        # key -> bucket holding its timer, where each bucket maps keys to their deadline tick
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def __contains__(self, key):
+        return key in self.buckets
+
+    def to_tick(self, when):
+        return int(when // self.resolution)
+
+    def schedule(self, key, when):
+        """
+        Set the timer for a key, replacing any timer it already had.
+
+        Args:
+            key (hashable): Identifies the timer.
+            when (float): Time the timer should fire at.
+        """
+        self.cancel(key)
+        self.insert(key, max(self.to_tick(when), self.current_tick))
+
+    def cancel(self, key):
+        """
+        Cancel a key's timer if it has one.
+        """
+        bucket = self.buckets.pop(key, None)
+        if bucket is not None:
+            del bucket[key]
+
+    def deadline(self, key):
+        """
+        Returns:
+            deadline (float): Start of the tick the key's timer will fire on, or None if it has no timer.
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return None
+        return bucket[key] * self.resolution
+
+    def insert(self, key, tick):
+        if tick <= self.current_tick:
+            bucket = self.ready
+        else:
+            bucket = self.overflow
+            for level, span in enumerate(self.spans):
+                # Use the lowest level where the deadline falls within the next turn of the wheel
+                if tick // span - self.current_tick // span < self.slots:
+                    bucket = self.levels[level][(tick // span) % self.slots]
+                    break
+        bucket[key] = tick
+        self.buckets[key] = bucket
+
+    def advance(self, now):
+        """
+        Move the wheel forward to the given time.
+
+        Args:
+            now (float): Current time.
+
+        Returns:
+            due (list): Keys whose timers fired, in deadline order. They no longer have timers.
+        """
+        due = self.pop_bucket(self.ready)
+        target_tick = self.to_tick(now)
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            # Cascade from the top down, since a higher level can fill a lower level's slot that is about to be used
+            if self.current_tick % (self.spans[-1] * self.slots) == 0:
+                self.cascade(self.overflow)
+            for level in range(len(self.spans) - 1, 0, -1):
+                span = self.spans[level]
+                if self.current_tick % span == 0:
+                    self.cascade(self.levels[level][(self.current_tick // span) % self.slots])
+            due.extend(self.pop_bucket(self.levels[0][self.current_tick % self.slots]))
+            # Timers cascaded down on the tick they are due at land here
+            due.extend(self.pop_bucket(self.ready))
+        return due
+
+    def cascade(self, bucket):
+        for key, tick in self.pop_bucket_items(bucket):
+            self.insert(key, tick)
+
+    def pop_bucket(self, bucket):
+        return [key for key, _ in self.pop_bucket_items(bucket)]
+
+    def pop_bucket_items(self, bucket):
+        items = list(bucket.items())
+        bucket.clear()
+        for key, _ in items:
+            del self.buckets[key]
+        return items
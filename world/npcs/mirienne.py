@@ -1,4 +1,4 @@
-from world.quests.lost_kitten import INTERNAL_NAME, LostKitten
+from world.quests.lost_kitten import INTERNAL_NAME
 
 
 def start(caller):
@@ -68,11 +68,8 @@ def kitten(caller):
             'paw and waves goodbye.\n\n'
             'You feel a little more perceptive.')
 
-    for obj in caller.contents:
-        if isinstance(obj, LostKitten):
-            obj.delete()
-
     # TODO: Increase perception skill
+    # Completing the quest takes the kitten
     caller.quest_complete(INTERNAL_NAME)
 
     return text, []
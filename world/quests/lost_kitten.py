@@ -22,3 +22,12 @@ class LostKitten(Object):
             self.locks.add("view:all()")
             self.db.desc = "Mirienne's cute kitten looks up at you trustingly and mewls softly."
             getter.quest_advance(INTERNAL_NAME, 2)
+
+
+def at_quest_complete(event):
+    """
+    Mirienne takes her kitten back when the quest is done.
+    """
+    for obj in event.character.contents:
+        if isinstance(obj, LostKitten):
+            obj.delete()